@@ -1,4 +1,10 @@
-import { useCallback, useEffect, useMemo, useState } from "react";
+import {
+  FormEvent,
+  useCallback,
+  useEffect,
+  useMemo,
+  useState,
+} from "react";
 import { Link, useNavigate } from "react-router-dom";
 import axios from "axios";
 import { ForceGraph3D } from "react-force-graph";
@@ -15,6 +21,14 @@ export interface Topic {
   created_at: string;
 }
 
+// A topic name completing the typed prefix, from /suggest.
+export interface TopicSuggestion {
+  id: string;
+  name: string;
+  type: string;
+  degree: number;
+}
+
 export interface TopicFinding {
   topic_id: string;
   finding_id: string;
@@ -25,7 +39,8 @@ export interface TopicWithFindings extends Topic {
   findings: Finding[];
   data: {
     topics: Topic[];
-    findings: Finding[];
+    // Only sent when requested with `fields=data.findings`; same as `findings`.
+    findings?: Finding[];
     edges: TopicFinding[];
   };
 }
@@ -43,6 +58,9 @@ export interface Finding {
   created_at: string;
 }
 
+// Suggestions are fetched at the server's maximum and filtered by type here.
+const SUGGEST_LIMIT = 25;
+
 const TOGGLES = {
   architecture: true,
   task: true,
@@ -71,6 +89,7 @@ type RawGraph = {
 
 function App() {
   const [query, setQuery] = useState<string>("");
+  const [suggestions, setSuggestions] = useState<TopicSuggestion[]>([]);
   const [searchResults, setSearchResults] = useState<Topic[]>([]);
   const [toggles, setToggles] = useState<{ [key: string]: boolean }>(TOGGLES);
   const navigate = useNavigate();
@@ -106,12 +125,36 @@ function App() {
     });
   }, []);
 
+  // Autocomplete from the server's in-memory topic name index, cheap enough
+  // to query on every keystroke; the full search runs on submit.
   useEffect(() => {
     if (query.length === 0) {
-      setSearchResults([]);
+      setSuggestions([]);
       return;
     }
-    try {
+    let ignore = false;
+    axios
+      .get(`${API_BASE_URL}/suggest`, {
+        params: { query, limit: SUGGEST_LIMIT },
+      })
+      .then((response) => {
+        if (!ignore && Array.isArray(response.data)) {
+          setSuggestions(response.data);
+        }
+      })
+      .catch((error) => console.error(error));
+    return () => {
+      ignore = true;
+    };
+  }, [query]);
+
+  const handleSearch = useCallback(
+    (e: FormEvent) => {
+      e.preventDefault();
+      if (query.length === 0) {
+        setSearchResults([]);
+        return;
+      }
       axios
         .get(`${API_BASE_URL}/search`, {
           params: {
@@ -123,11 +166,11 @@ function App() {
         })
         .then((response) => {
           setSearchResults(response.data);
-        });
-    } catch (error) {
-      console.error(error);
-    }
-  }, [query, toggles]);
+        })
+        .catch((error) => console.error(error));
+    },
+    [query, toggles]
+  );
 
   const handleClick = useCallback(
     (node: { id: string | undefined; type: string }) => {
@@ -178,14 +221,31 @@ function App() {
               </div>
             ))}
           </div>
-          <input
-            id="search"
-            type="text"
-            value={query}
-            placeholder="Search..."
-            onChange={(e) => setQuery(e.target.value)}
-            className="border border-gray-300 rounded px-2 py-1 w-full"
-          />
+          <form onSubmit={handleSearch}>
+            <input
+              id="search"
+              type="text"
+              value={query}
+              placeholder="Search..."
+              onChange={(e) => setQuery(e.target.value)}
+              className="border border-gray-300 rounded px-2 py-1 w-full"
+            />
+          </form>
+          {suggestions.length > 0 && (
+            <div className="border border-gray-300 rounded px-3 py-2 flex flex-col space-y-1">
+              {suggestions
+                .filter((suggestion) => toggles[suggestion.type] ?? true)
+                .map((suggestion) => (
+                  <Link
+                    key={suggestion.id}
+                    to={`/${encodeURIComponent(suggestion.id)}`}
+                  >
+                    {suggestion.name}{" "}
+                    <span className="text-gray-500">{suggestion.type}</span>
+                  </Link>
+                ))}
+            </div>
+          )}
           <div className="border border-gray-300 rounded px-3 py-2 bg-gray-50 flex flex-col space-y-2">
             {searchResults.map((result) => (
               <Link key={result.id} to={`/${encodeURIComponent(result.id)}`}>
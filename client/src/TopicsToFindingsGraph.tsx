@@ -52,7 +52,7 @@ export const TopicsToFindingsGraph = () => {
           ...edges.filter((edge) => edge.source === topic.id),
         ],
       })) || []),
-      ...(entity?.data?.findings.map((finding) => ({
+      ...(entity?.findings.map((finding) => ({
         id: finding.id,
         name: finding.name,
         color: "red",
@@ -78,7 +78,7 @@ export const TopicsToFindingsGraph = () => {
     };
 
     setGraphData(newGraphData);
-  }, [entity?.data]);
+  }, [entity]);
 
   const handleClick = useCallback(
     (node: { id: string | undefined; type: string }) => {
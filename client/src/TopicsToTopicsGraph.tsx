@@ -57,7 +57,7 @@ export const TopicsToTopicsGraph = () => {
     // If a node is a finding, for every two topics it is connected to, add a link between those two topics
 
     // Start with all findings
-    const findings = entity?.data?.findings || [];
+    const findings = entity?.findings || [];
 
     // Then for each finding, get the topics it is connected to
     const connectedTopicIds = findings.map((finding) => {
@@ -115,7 +115,7 @@ export const TopicsToTopicsGraph = () => {
     setTopicsGraphData(newTopicsGraphData);
 
     // Then, we filter for all nodes that are topics
-  }, [entity?.data]);
+  }, [entity]);
 
   const handleRightClick = useCallback(
     (node: { id: string | undefined; type: string }) => {
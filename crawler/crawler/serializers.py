@@ -1,14 +1,180 @@
+import io
+import os
+from collections import deque
+from collections.abc import Callable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from itertools import pairwise
 from os import PathLike
 from pathlib import Path
 from types import TracebackType
-from typing import Any, Generic, Iterator, Type, TypeVar
+from typing import Any, Generic, TypeVar
+
+import numpy as np
 import orjson
+import pyarrow as pa
+import pyarrow.parquet as pq
+import zstandard
 from loguru import logger
 from pydantic import BaseModel
 
+BaseModelT = TypeVar("BaseModelT", bound=BaseModel)
+T = TypeVar("T")
+
+# Bytes of whole lines handed to a worker at a time by `NdjsonReader.batches`.
+DEFAULT_BLOCK_SIZE = 16 * 1024 * 1024
 
+# Bytes of serialized lines `NdjsonWriter` buffers between writes.
+DEFAULT_WRITE_BUFFER_SIZE = 4 * 1024 * 1024
 
-BaseModelT = TypeVar("BaseModelT", bound=BaseModel)
+# zstd level of compressed `.zst` files, a fast one for large pipeline files.
+DEFAULT_ZSTD_LEVEL = 3
+
+# Rows per Parquet row group, the unit `ParquetReader` reads at a time.
+DEFAULT_ROW_GROUP_SIZE = 128 * 1024
+
+ARROW_TYPES: dict[Any, pa.DataType] = {
+    str: pa.string(),
+    int: pa.int64(),
+    float: pa.float64(),
+    bool: pa.bool_(),
+}
+
+
+def parse_line(
+    line: bytes, model: type[BaseModelT], validate: bool, strict: bool
+) -> BaseModelT | None:
+    try:
+        if validate:
+            return model.model_validate_json(line)
+        else:
+            parsed = orjson.loads(line)
+            return model.model_construct(**parsed)
+    except Exception as e:
+        if strict:
+            raise
+        else:
+            logger.error(f"Error parsing line: {line}")
+            logger.error(e)
+            return None
+
+
+def parse_block(
+    block: bytes,
+    model: type[BaseModelT],
+    validate: bool,
+    strict: bool,
+    fn: Callable[[list[BaseModelT]], T] | None = None,
+) -> list[BaseModelT] | T:
+    models = (parse_line(line, model, validate, strict) for line in block.splitlines())
+    parsed = [m for m in models if m is not None]
+    return fn(parsed) if fn is not None else parsed
+
+
+def open_file(
+    path: "PathLike[Any]",
+    mode: str = "rb",
+    level: int = DEFAULT_ZSTD_LEVEL,
+    threads: int = -1,
+    compressed: bool | None = None,
+):
+    """
+    Opens a file for reading ("r", "rb") or writing ("w", "wb"),
+    decompressing or compressing it with zstd as a stream if `compressed`,
+    by default if its name ends in `.zst`. Compression runs on `threads`
+    threads (one per core by default), and reading continues across
+    concatenated frames.
+    """
+    path = Path(path)
+    if compressed is None:
+        compressed = path.suffix == ".zst"
+    if not compressed:
+        return path.open(mode)
+
+    raw = path.open(mode[0] + "b")
+    if mode[0] == "r":
+        file = io.BufferedReader(
+            zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+        )
+    else:
+        file = zstandard.ZstdCompressor(level=level, threads=threads).stream_writer(raw)
+
+    return file if "b" in mode else io.TextIOWrapper(file)
+
+
+def read_blocks(file, block_size: int, end: int | None = None) -> Iterator[bytes]:
+    """
+    Reads `file` up to byte `end` in blocks of about `block_size` bytes,
+    each ending at a line break so no line is split between blocks.
+    """
+    rest = b""
+    while block := file.read(
+        block_size if end is None else min(block_size, end - file.tell())
+    ):
+        split = block.rfind(b"\n") + 1
+        if split == 0:
+            rest += block
+            continue
+        yield rest + block[:split]
+        rest = block[split:]
+    if rest:
+        yield rest
+
+
+def dump_line(model: BaseModel, exclude_none: bool = False) -> bytes:
+    """
+    The model as a line of JSON, the bytes `model_dump_json` would encode to.
+    """
+    return (
+        model.__pydantic_serializer__.to_json(model, exclude_none=exclude_none) + b"\n"
+    )
+
+
+def scan_line_offsets(path: Path) -> np.ndarray:
+    starts = [np.zeros(1, dtype=np.int64)]
+    position = 0
+    with path.open("rb") as f:
+        while block := f.read(DEFAULT_BLOCK_SIZE):
+            newlines = np.flatnonzero(np.frombuffer(block, dtype=np.uint8) == 10)
+            starts.append(newlines + position + 1)
+            position += len(block)
+
+    offsets = np.concatenate(starts)
+    # a last line without a line break still ends at the end of the file
+    if offsets[-1] != position:
+        offsets = np.append(offsets, position)
+    return offsets
+
+
+def line_offsets(path: Path) -> np.ndarray:
+    """
+    Byte offsets of the lines of a file: line `i` spans
+    `offsets[i]:offsets[i + 1]`. They're memory-mapped from a
+    `.offsets.npy` sidecar next to the file, built with a single scan the
+    first time (or when the file has changed since). Where the sidecar
+    can't be written (e.g. a read-only directory), the scan is kept in
+    memory instead.
+    """
+    index_path = path.with_name(path.name + ".offsets.npy")
+    size = path.stat().st_size
+
+    if index_path.exists() and index_path.stat().st_mtime >= path.stat().st_mtime:
+        offsets = np.load(index_path, mmap_mode="r")
+        if offsets[-1] == size:
+            return offsets
+
+    offsets = scan_line_offsets(path)
+
+    tmp_path = index_path.with_name(index_path.name + ".tmp")
+    try:
+        with tmp_path.open("wb") as f:
+            np.save(f, offsets)
+        os.replace(tmp_path, index_path)
+    except OSError as e:
+        logger.warning(f"Can't save line offsets of {path}: {e}")
+        tmp_path.unlink(missing_ok=True)
+        return offsets
+
+    return np.load(index_path, mmap_mode="r")
 
 
 class NdjsonReader(Generic[BaseModelT]):
@@ -18,34 +184,416 @@ class NdjsonReader(Generic[BaseModelT]):
         model: type[BaseModelT],
         validate: bool = False,
         strict: bool = True,
+        byte_range: tuple[int, int] | None = None,
     ):
+        """
+        Reads the whole file, or only the lines in `byte_range`, e.g. one of
+        the ranges from `shards`.
+        """
         self.path = Path(path)
         self.model = model
         self.validate = validate
         self.strict = strict
+        self.byte_range = byte_range
+        self._offsets: np.ndarray | None = None
+
+    @property
+    def compressed(self) -> bool:
+        return self.path.suffix == ".zst"
 
     def __enter__(self):
-        self.file = self.path.open("r")
+        self.file = open_file(self.path, "rb")
+        if self.byte_range is not None:
+            if self.compressed:
+                raise ValueError(f"Can't read byte ranges of compressed {self.path}")
+            self.file.seek(self.byte_range[0])
         return self
 
     def __exit__(
-        self, exc_type: Type[Exception], exc_value: Exception, traceback: TracebackType
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
     ):
         self.file.close()
 
     def __iter__(
         self,
     ) -> Iterator[BaseModelT]:
+        for line in self.lines():
+            model = parse_line(line, self.model, self.validate, self.strict)
+            if model is not None:
+                yield model
+
+    def count(self) -> int:
+        """
+        Number of lines in the file (or byte range), from its offset index.
+        Builds the index if there is none yet, so this can take a scan of
+        the file; deliberately not `__len__`, which `list` and `tqdm` call
+        implicitly.
+        """
+        offsets = self.offsets()
+        if self.byte_range is None:
+            return len(offsets) - 1
+        start, end = np.searchsorted(offsets, self.byte_range)
+        return int(end - start)
+
+    def offsets(self) -> np.ndarray:
+        if self.compressed:
+            raise ValueError(f"Can't index lines of compressed {self.path}")
+        if self._offsets is None:
+            self._offsets = line_offsets(self.path)
+        return self._offsets
+
+    def lines(self) -> Iterator[bytes]:
+        end = self.byte_range[1] if self.byte_range is not None else None
+        position = self.file.tell()
         for line in self.file:
-            try:
-                if self.validate:
-                    yield self.model.model_validate_json(line)
-                else:
-                    parsed = orjson.loads(line)
-                    yield self.model.model_construct(**parsed)
-            except Exception as e:
-                if self.strict:
-                    raise e
+            if end is not None and position >= end:
+                break
+            position += len(line)
+            yield line
+
+    def seek(self, n: int):
+        """
+        Moves to line `n`, where iteration continues from.
+        """
+        self.file.seek(int(self.offsets()[n]))
+
+    def shards(self, n: int) -> list[tuple[int, int]]:
+        """
+        Splits the file into up to `n` byte ranges of about as many lines
+        each, to read in parallel with `byte_range`.
+        """
+        offsets = self.offsets()
+        bounds = offsets[np.linspace(0, len(offsets) - 1, n + 1).astype(np.int64)]
+        return [
+            (int(start), int(end)) for start, end in pairwise(bounds) if end > start
+        ]
+
+    def batches(
+        self,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+        workers: int | None = None,
+        ordered: bool = True,
+    ) -> Iterator[list[BaseModelT]]:
+        """
+        Yields the models of the remaining lines in lists, one per block of
+        about `block_size` bytes, parsed in a pool of `workers` processes
+        (one per core by default). Blocks are yielded in file order, or as
+        soon as they are parsed if not `ordered`. The model has to be
+        importable by the workers, i.e. defined at module level.
+
+        Models are pickled back from the workers, which for large nested
+        models costs about as much as validating them again; prefer
+        `map_batches` to do the work on them in the workers as well.
+        """
+        return self.map_batches(None, block_size, workers, ordered)
+
+    def map_batches(
+        self,
+        fn: Callable[[list[BaseModelT]], T] | None,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+        workers: int | None = None,
+        ordered: bool = True,
+    ) -> Iterator[T]:
+        """
+        Like `batches`, but yields `fn` of each list of models, called in
+        the worker that parsed them. `fn` has to be defined at module level.
+        """
+        workers = workers or os.cpu_count() or 1
+        end = self.byte_range[1] if self.byte_range is not None else None
+        blocks = read_blocks(self.file, block_size, end)
+
+        with ProcessPoolExecutor(workers) as executor:
+
+            def submit(block: bytes) -> Future:
+                return executor.submit(
+                    parse_block, block, self.model, self.validate, self.strict, fn
+                )
+
+            # Two blocks per worker in flight, so workers never wait on
+            # reads but the file isn't read faster than it is parsed.
+            pending: deque[Future] = deque(
+                submit(block) for _, block in zip(range(2 * workers), blocks)
+            )
+
+            while pending:
+                if ordered:
+                    done = [pending.popleft()]
                 else:
-                    logger.error(f"Error parsing line: {line}")
-                    logger.error(e)
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    done = [future for future in pending if future in finished]
+                    for future in done:
+                        pending.remove(future)
+
+                for future in done:
+                    block = next(blocks, None)
+                    if block is not None:
+                        pending.append(submit(block))
+                    yield future.result()
+
+
+class NdjsonWriter(Generic[BaseModelT]):
+    """
+    Writes models as lines of JSON, buffering the serialized lines and
+    writing them in blocks of about `buffer_size` bytes. Compressed with
+    zstd if the name ends in `.zst` (see `open_file`).
+
+    Unless not `atomic`, the file is written under a temporary name and
+    only renamed to `path` when complete, so a failed run never leaves a
+    partial file for the next stage to read. Otherwise, lines written
+    before a failure are kept, and with `append` added to an existing file
+    (for stages too expensive to rerun, resuming where they stopped).
+    """
+
+    def __init__(
+        self,
+        path: "PathLike[Any]",
+        model: type[BaseModelT],
+        exclude_none: bool = False,
+        buffer_size: int = DEFAULT_WRITE_BUFFER_SIZE,
+        atomic: bool = True,
+        append: bool = False,
+        level: int = DEFAULT_ZSTD_LEVEL,
+        threads: int = -1,
+    ):
+        if atomic and append:
+            raise ValueError("Appending to a file can't be atomic")
+
+        self.path = Path(path)
+        self.model = model
+        self.exclude_none = exclude_none
+        self.buffer_size = buffer_size
+        self.atomic = atomic
+        self.append = append
+        self.level = level
+        self.threads = threads
+
+    @property
+    def write_path(self) -> Path:
+        if self.atomic:
+            return self.path.with_name(self.path.name + ".tmp")
+        return self.path
+
+    def __enter__(self):
+        compressed = self.path.suffix == ".zst"
+        self.file = open_file(
+            self.write_path,
+            "ab" if self.append else "wb",
+            self.level,
+            self.threads,
+            compressed=compressed,
+        )
+        self.buffer: list[bytes] = []
+        self.buffered = 0
+
+        # end a line cut off by an earlier failure, so appended lines
+        # aren't joined to it
+        if self.append and not compressed and self.file.tell() > 0:
+            with self.path.open("rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    self.file.write(b"\n")
+
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ):
+        if exc_type is None or not self.atomic:
+            self.flush()
+        self.file.close()
+
+        if self.atomic:
+            if exc_type is None:
+                os.replace(self.write_path, self.path)
+            else:
+                self.write_path.unlink()
+
+    def write(self, model: BaseModelT):
+        self.write_lines(dump_line(model, self.exclude_none))
+
+    def write_lines(self, lines: bytes):
+        """
+        Writes already serialized lines, e.g. from `dump_line` in a worker.
+        """
+        self.buffer.append(lines)
+        self.buffered += len(lines)
+        if self.buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.file.write(b"".join(self.buffer))
+            self.file.flush()
+            self.buffer = []
+            self.buffered = 0
+
+
+def arrow_schema(model: type[BaseModel]) -> pa.Schema:
+    """
+    The Arrow schema of a flat model, one column per field.
+    """
+    return pa.schema(
+        [
+            pa.field(name, ARROW_TYPES[field.annotation], nullable=False)
+            for name, field in model.model_fields.items()
+        ]
+    )
+
+
+def to_record_batch(
+    models: list[BaseModelT], model: type[BaseModelT]
+) -> pa.RecordBatch:
+    return pa.RecordBatch.from_pylist(
+        [m.model_dump() for m in models], schema=arrow_schema(model)
+    )
+
+
+class ParquetWriter(Generic[BaseModelT]):
+    """
+    Writes models of a flat model (only str, int, float and bool fields) as
+    rows of a zstd compressed Parquet file, buffering them into row groups
+    of `row_group_size` rows.
+
+    Like `NdjsonWriter`, the file is written under a temporary name and only
+    renamed to `path` when complete, so a failed run never leaves a
+    truncated file (without its footer) for the next stage to read.
+    """
+
+    def __init__(
+        self,
+        path: "PathLike[Any]",
+        model: type[BaseModelT],
+        row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+        compression: str = "zstd",
+    ):
+        self.path = Path(path)
+        self.model = model
+        self.schema = arrow_schema(model)
+        self.row_group_size = row_group_size
+        self.compression = compression
+
+    @property
+    def write_path(self) -> Path:
+        return self.path.with_name(self.path.name + ".tmp")
+
+    def __enter__(self):
+        self.file = pq.ParquetWriter(
+            self.write_path, self.schema, compression=self.compression
+        )
+        self.rows: list[dict[str, Any]] = []
+        self.batches: list[pa.RecordBatch] = []
+        self.buffered = 0
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ):
+        try:
+            if exc_type is None:
+                self.flush()
+        finally:
+            self.file.close()
+
+        if exc_type is None:
+            os.replace(self.write_path, self.path)
+        else:
+            self.write_path.unlink()
+
+    def write(self, model: BaseModelT):
+        self.rows.append(model.model_dump())
+        if self.buffered + len(self.rows) >= self.row_group_size:
+            self.flush()
+
+    def write_batch(self, batch: pa.RecordBatch):
+        """
+        Writes rows already in columns, e.g. from `to_record_batch` in a
+        worker.
+        """
+        self.flush_rows()
+        self.batches.append(batch)
+        self.buffered += batch.num_rows
+        if self.buffered >= self.row_group_size:
+            self.flush()
+
+    def flush_rows(self):
+        if self.rows:
+            self.batches.append(
+                pa.RecordBatch.from_pylist(self.rows, schema=self.schema)
+            )
+            self.buffered += len(self.rows)
+            self.rows = []
+
+    def flush(self):
+        self.flush_rows()
+        if self.batches:
+            self.file.write_table(
+                pa.Table.from_batches(self.batches, schema=self.schema),
+                row_group_size=self.row_group_size,
+            )
+            self.batches = []
+            self.buffered = 0
+
+
+class ParquetReader(Generic[BaseModelT]):
+    """
+    Reads a Parquet file written by `ParquetWriter`, memory-mapped and one
+    row group at a time. Only `columns` are read if given, in which case
+    the models only have those fields set.
+    """
+
+    def __init__(
+        self,
+        path: "PathLike[Any]",
+        model: type[BaseModelT],
+        columns: list[str] | None = None,
+    ):
+        self.path = Path(path)
+        self.model = model
+        self.columns = columns
+
+    def __enter__(self):
+        self.file = pq.ParquetFile(self.path, memory_map=True)
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ):
+        self.file.close()
+
+    def __iter__(self) -> Iterator[BaseModelT]:
+        for batch in self.batches():
+            for row in batch.to_pylist():
+                yield self.model.model_construct(**row)
+
+    def __len__(self) -> int:
+        return self.file.metadata.num_rows
+
+    def batches(self) -> Iterator[pa.RecordBatch]:
+        return self.file.iter_batches(columns=self.columns)
+
+    def rows(self) -> Iterator[tuple]:
+        """
+        The rows as tuples of the values of `columns` (all by default),
+        without building models.
+        """
+        for batch in self.batches():
+            yield from zip(*(column.to_pylist() for column in batch.columns))
+
+    def table(self) -> pa.Table:
+        """
+        The whole file (or `columns`) as an Arrow table, e.g. for
+        `polars.from_arrow`.
+        """
+        return self.file.read(columns=self.columns)
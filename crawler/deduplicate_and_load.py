@@ -4,9 +4,17 @@ from pathlib import Path
 from uuid import uuid4
 
 import click
+import numpy as np
+import pyarrow as pa
+from scipy import sparse
 from tqdm import tqdm
 from crawler.types import PaperAnalysisRun, process_response
-from crawler.serializers import NdjsonReader
+from crawler.serializers import (
+    NdjsonReader,
+    ParquetReader,
+    ParquetWriter,
+    to_record_batch,
+)
 from huggingface_hub import HfApi
 import os
 from pydantic import BaseModel
@@ -72,82 +80,104 @@ def cli():
     pass
 
 
-@cli.command()
-def prepare():
-    with NdjsonReader(
-        Path(
-            HF_API.hf_hub_download(
-                repo_id="vllg/parsed_papers",
-                filename="merged.jsonl",
-                repo_type="dataset",
+def prepare_runs(runs: list[PaperAnalysisRun]) -> list[pa.RecordBatch]:
+    """
+    The paper, finding, topic and topic-finding rows of a batch of runs.
+    """
+    papers: list[PaperModel] = []
+    findings: list[FindingModel] = []
+    topics: list[TopicModel] = []
+    topic_findings: list[TopicFindingModel] = []
+
+    for p in runs:
+        paper = p.prompt.paper
+
+        processed = process_response(p.response)
+
+        papers.append(
+            PaperModel(
+                paper_id=paper.paper_id,
+                authors=paper.metadata.authors,
+                title=paper.metadata.title,
+                update_date=paper.metadata.update_date,
+                abstract=paper.metadata.abstract,
             )
-        ),
-        PaperAnalysisRun,
-        validate=True,
-    ) as f:
-        with (
-            open("data/processed/paper_models.jsonl", "w") as paper_w,
-            open("data/processed/finding_models.jsonl", "w") as finding_w,
-            open("data/processed/topic_models.jsonl", "w") as topic_w,
-            open("data/processed/topic_finding_models.jsonl", "w") as topic_finding_w,
-        ):
-            for p in tqdm(f):
-                paper = p.prompt.paper
-
-                processed = process_response(p.response)
-
-                paper_w.write(
-                    PaperModel(
-                        paper_id=paper.paper_id,
-                        authors=paper.metadata.authors,
-                        title=paper.metadata.title,
-                        update_date=paper.metadata.update_date,
-                        abstract=paper.metadata.abstract,
-                    ).model_dump_json()
+        )
+
+        for finding in processed[0]:
+            findings.append(
+                FindingModel(
+                    finding_id=finding.finding_id,
+                    name=finding.name,
+                    slug=finding.slug,
+                    description=finding.description,
+                    paper_id=paper.paper_id,
                 )
-                paper_w.write("\n")
-
-                for finding in processed[0]:
-                    finding_w.write(
-                        FindingModel(
-                            finding_id=finding.finding_id,
-                            name=finding.name,
-                            slug=finding.slug,
-                            description=finding.description,
-                            paper_id=paper.paper_id,
-                        ).model_dump_json()
-                    )
-                    finding_w.write("\n")
-
-                for topic in processed[1]:
-                    topic_w.write(
-                        TopicModel(
-                            topic_id=topic.topic_id,
-                            name=topic.name,
-                            type=topic.type,
-                            slug=topic.slug,
-                            description=topic.description,
-                        ).model_dump_json()
+            )
+
+        for topic in processed[1]:
+            topics.append(
+                TopicModel(
+                    topic_id=topic.topic_id,
+                    name=topic.name,
+                    type=topic.type,
+                    slug=topic.slug,
+                    description=topic.description,
+                )
+            )
+            for finding_id in topic.linked_finding_ids:
+                topic_findings.append(
+                    TopicFindingModel(
+                        topic_id=topic.topic_id,
+                        finding_id=finding_id,
                     )
-                    topic_w.write("\n")
-                    for finding_id in topic.linked_finding_ids:
-                        topic_finding_w.write(
-                            TopicFindingModel(
-                                topic_id=topic.topic_id,
-                                finding_id=finding_id,
-                            ).model_dump_json()
-                        )
-                        topic_finding_w.write("\n")
+                )
+
+    return [
+        to_record_batch(papers, PaperModel),
+        to_record_batch(findings, FindingModel),
+        to_record_batch(topics, TopicModel),
+        to_record_batch(topic_findings, TopicFindingModel),
+    ]
+
+
+@cli.command()
+def prepare():
+    with (
+        NdjsonReader(
+            Path(
+                HF_API.hf_hub_download(
+                    repo_id="vllg/parsed_papers",
+                    filename="merged.jsonl",
+                    repo_type="dataset",
+                )
+            ),
+            PaperAnalysisRun,
+            validate=True,
+        ) as f,
+        ParquetWriter("data/processed/paper_models.parquet", PaperModel) as paper_w,
+        ParquetWriter(
+            "data/processed/finding_models.parquet", FindingModel
+        ) as finding_w,
+        ParquetWriter("data/processed/topic_models.parquet", TopicModel) as topic_w,
+        ParquetWriter(
+            "data/processed/topic_finding_models.parquet", TopicFindingModel
+        ) as topic_finding_w,
+    ):
+        writers = (paper_w, finding_w, topic_w, topic_finding_w)
+
+        # runs are parsed and processed in parallel, in blocks
+        for batches in tqdm(f.map_batches(prepare_runs)):
+            for w, batch in zip(writers, batches):
+                w.write_batch(batch)
 
 
 @cli.command()
 def resolve():
     topic_models: list[TopicModel] = []
 
-    with NdjsonReader(
-        Path("data/processed/topic_models.jsonl"), TopicModel, validate=True
-    ) as f:
-        for p in tqdm(f):
+    with ParquetReader(Path("data/processed/topic_models.parquet"), TopicModel) as f:
+        for p in tqdm(f, total=len(f)):
             topic_models.append(p)
 
     topics_by_id: dict[str, TopicModel] = {
@@ -241,10 +271,10 @@ def resolve():
 
     raw_to_resolved_topic_id: dict[str, str] = dict()
 
-    with open(
-        "data/processed/processed_topic_models.jsonl", "w"
-    ) as processed_topic_w, open(
-        "data/processed/resolved_topic_models.jsonl", "w"
+    with ParquetWriter(
+        "data/processed/processed_topic_models.parquet", ProcessedTopicModel
+    ) as processed_topic_w, ParquetWriter(
+        "data/processed/resolved_topic_models.parquet", ResolvedTopicModel
     ) as resolved_topic_w:
         for value in tqdm(merged_topic_ids.values()):
             topics = [topics_by_id[topic_id] for topic_id in value]
@@ -257,8 +287,7 @@ def resolve():
                 description=topics[0].description,
             )
 
-            resolved_topic_w.write(resolved_topic.model_dump_json())
-            resolved_topic_w.write("\n")
+            resolved_topic_w.write(resolved_topic)
 
             for topic in topics:
                 processed_topic = ProcessedTopicModel(
@@ -270,119 +299,216 @@ def resolve():
                     resolved_topic_id=resolved_topic.topic_id,
                 )
                 raw_to_resolved_topic_id[topic.topic_id] = resolved_topic.topic_id
-                processed_topic_w.write(processed_topic.model_dump_json())
-                processed_topic_w.write("\n")
+                processed_topic_w.write(processed_topic)
 
-    with NdjsonReader(
-        Path("data/processed/topic_finding_models.jsonl"), TopicFindingModel
-    ) as topic_finding_r, open(
-        "data/processed/processed_topic_finding_models.jsonl", "w"
+    with ParquetReader(
+        Path("data/processed/topic_finding_models.parquet"), TopicFindingModel
+    ) as topic_finding_r, ParquetWriter(
+        "data/processed/processed_topic_finding_models.parquet",
+        ProcessedTopicFindingModel,
     ) as processed_topic_finding_w:
-        for topic_finding in tqdm(topic_finding_r):
-            resolved_topic_id = raw_to_resolved_topic_id[topic_finding.topic_id]
-
-            processed_topic_finding = ProcessedTopicFindingModel(
-                topic_id=topic_finding.topic_id,
-                finding_id=topic_finding.finding_id,
-                resolved_topic_id=resolved_topic_id,
+        # the topic and finding columns are passed through as they are
+        for batch in tqdm(topic_finding_r.batches()):
+            resolved_topic_ids = [
+                raw_to_resolved_topic_id[topic_id]
+                for topic_id in batch.column("topic_id").to_pylist()
+            ]
+            processed_topic_finding_w.write_batch(
+                pa.RecordBatch.from_arrays(
+                    [
+                        batch.column("topic_id"),
+                        batch.column("finding_id"),
+                        pa.array(resolved_topic_ids, pa.string()),
+                    ],
+                    schema=processed_topic_finding_w.schema,
+                )
             )
-            processed_topic_finding_w.write(processed_topic_finding.model_dump_json())
-            processed_topic_finding_w.write("\n")
+
+
+# Unknown ids leave their key NULL and fail the NOT NULL constraint, as foreign
+# keys on the ids would.
+TOPIC_FINDING_STAGING_INSERT = """
+INSERT INTO topic_finding (topic_key, finding_key, resolved_topic_key)
+SELECT t.key, f.key, rt.key
+FROM topic_finding_staging s
+LEFT JOIN topic t ON t.id = s.topic_id
+LEFT JOIN finding f ON f.id = s.finding_id
+LEFT JOIN resolved_topic rt ON rt.id = s.resolved_topic_id
+"""
 
 
 @cli.command()
 def load_postgres():
     INTERNAL_DB_CONNECTION_STR = "dbname='mydb' user='myuser' host='localhost' password='mysecretpassword' port='5432'"
-    with psycopg.connect(INTERNAL_DB_CONNECTION_STR, row_factory=dict_row) as conn:
-        with conn.cursor() as cur:
-            with cur.copy(
+    with (
+        psycopg.connect(INTERNAL_DB_CONNECTION_STR, row_factory=dict_row) as conn,
+        conn.cursor() as cur,
+    ):
+        # Each file is read as the columns its COPY lists, in that order.
+        with (
+            cur.copy(
                 "COPY paper (id, authors, title, update_date, abstract, created_at) FROM STDIN"
-            ) as paper_copy:
-                with NdjsonReader(
-                    Path("data/processed/paper_models.jsonl"), PaperModel
-                ) as f:
-                    for line in tqdm(f):
-                        paper_copy.write_row(
-                            (
-                                line.paper_id,
-                                line.authors,
-                                line.title,
-                                line.update_date,
-                                line.abstract.strip(),
-                                datetime.datetime.now(),
-                            )
-                        )
+            ) as paper_copy,
+            ParquetReader(
+                Path("data/processed/paper_models.parquet"),
+                PaperModel,
+                columns=["paper_id", "authors", "title", "update_date", "abstract"],
+            ) as f,
+        ):
+            for paper_id, authors, title, update_date, abstract in tqdm(
+                f.rows(), total=len(f)
+            ):
+                paper_copy.write_row(
+                    (
+                        paper_id,
+                        authors,
+                        title,
+                        update_date,
+                        abstract.strip(),
+                        datetime.datetime.now(),
+                    )
+                )
 
-            with cur.copy(
+        with (
+            cur.copy(
                 "COPY finding (id, name, slug, description, paper_id, created_at) FROM STDIN"
-            ) as finding_copy:
-                with NdjsonReader(
-                    Path("data/processed/finding_models.jsonl"), FindingModel
-                ) as f:
-                    for line in tqdm(f):
-                        finding_copy.write_row(
-                            (
-                                line.finding_id,
-                                line.name,
-                                line.slug,
-                                line.description,
-                                line.paper_id,
-                                datetime.datetime.now(),
-                            )
-                        )
+            ) as finding_copy,
+            ParquetReader(
+                Path("data/processed/finding_models.parquet"),
+                FindingModel,
+                columns=["finding_id", "name", "slug", "description", "paper_id"],
+            ) as f,
+        ):
+            for row in tqdm(f.rows(), total=len(f)):
+                finding_copy.write_row((*row, datetime.datetime.now()))
 
-            with cur.copy(
+        with (
+            cur.copy(
                 "COPY resolved_topic (id, name, type, slug, description, created_at) FROM STDIN"
-            ) as resolved_topic_copy:
-                with NdjsonReader(
-                    Path("data/processed/resolved_topic_models.jsonl"),
-                    ResolvedTopicModel,
-                ) as f:
-                    for line in tqdm(f):
-                        resolved_topic_copy.write_row(
-                            (
-                                line.topic_id,
-                                line.name,
-                                line.type,
-                                line.slug,
-                                line.description,
-                                datetime.datetime.now(),
-                            )
-                        )
+            ) as resolved_topic_copy,
+            ParquetReader(
+                Path("data/processed/resolved_topic_models.parquet"),
+                ResolvedTopicModel,
+                columns=["topic_id", "name", "type", "slug", "description"],
+            ) as f,
+        ):
+            for row in tqdm(f.rows(), total=len(f)):
+                resolved_topic_copy.write_row((*row, datetime.datetime.now()))
 
-            with cur.copy(
+        with (
+            cur.copy(
                 "COPY topic (id, name, type, slug, description, created_at, resolved_topic_id) FROM STDIN"
-            ) as topic_copy:
-                with NdjsonReader(
-                    Path("data/processed/processed_topic_models.jsonl"),
-                    ProcessedTopicModel,
-                ) as f:
-                    for line in tqdm(f):
-                        topic_copy.write_row(
-                            (
-                                line.topic_id,
-                                line.name,
-                                line.type,
-                                line.slug,
-                                line.description,
-                                datetime.datetime.now(),
-                                line.resolved_topic_id,
-                            )
-                        )
+            ) as topic_copy,
+            ParquetReader(
+                Path("data/processed/processed_topic_models.parquet"),
+                ProcessedTopicModel,
+                columns=[
+                    "topic_id",
+                    "name",
+                    "type",
+                    "slug",
+                    "description",
+                    "resolved_topic_id",
+                ],
+            ) as f,
+        ):
+            for *row, resolved_topic_id in tqdm(f.rows(), total=len(f)):
+                topic_copy.write_row((*row, datetime.datetime.now(), resolved_topic_id))
+
+        # topic_finding stores the surrogate keys of the ids, looked up with
+        # a single join once every edge is staged
+        cur.execute(
+            "CREATE TEMP TABLE topic_finding_staging (topic_id TEXT, finding_id TEXT, resolved_topic_id TEXT) ON COMMIT DROP"
+        )
+        with (
+            cur.copy(
+                "COPY topic_finding_staging (topic_id, finding_id, resolved_topic_id) FROM STDIN"
+            ) as topic_finding_copy,
+            ParquetReader(
+                Path("data/processed/processed_topic_finding_models.parquet"),
+                ProcessedTopicFindingModel,
+                columns=["topic_id", "finding_id", "resolved_topic_id"],
+            ) as f,
+        ):
+            for row in tqdm(f.rows(), total=len(f)):
+                topic_finding_copy.write_row(row)
+        cur.execute(TOPIC_FINDING_STAGING_INSERT)
+
+        # signal the server to rebuild anything derived from the data
+        cur.execute(
+            "UPDATE data_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP"
+        )
+
+
+@cli.command()
+@click.option("--top-k", default=50, help="Related topics kept per topic")
+@click.option("--block-size", default=4096, help="Topics scored at a time")
+def compute_related_topics(top_k: int, block_size: int):
+    """
+    Scores every pair of resolved topics sharing a finding by the Jaccard
+    similarity of their finding sets, and loads each topic's top `top_k`
+    into related_topic. Edges are read from topic_finding, so the scores
+    cover every load so far. Shared finding counts come from multiplying the
+    topic-finding incidence matrix by its transpose, a block of rows at a
+    time to bound memory. Run after load_postgres.
+    """
+    INTERNAL_DB_CONNECTION_STR = "dbname='mydb' user='myuser' host='localhost' password='mysecretpassword' port='5432'"
+
+    with psycopg.connect(INTERNAL_DB_CONNECTION_STR) as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT DISTINCT resolved_topic_key, finding_key FROM topic_finding"
+        )
+        pairs = np.array(cur.fetchall(), dtype=np.int64).reshape(-1, 2)
+
+        cur.execute("SELECT key, id FROM resolved_topic")
+        topic_ids_by_key = dict(cur.fetchall())
+
+    # indices of topics and findings in order of key
+    topic_keys, rows = np.unique(pairs[:, 0], return_inverse=True)
+    finding_keys, cols = np.unique(pairs[:, 1], return_inverse=True)
+    topic_ids = [topic_ids_by_key[key] for key in topic_keys.tolist()]
+
+    # topics x findings, 1 where the topic is linked to the finding
+    incidence = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.int32), (rows, cols)),
+        shape=(len(topic_ids), len(finding_keys)),
+    )
+    incidence_t = incidence.T.tocsr()
+    finding_counts = np.asarray(incidence.sum(axis=1)).ravel()
+
+    with psycopg.connect(INTERNAL_DB_CONNECTION_STR) as conn, conn.cursor() as cur:
+        cur.execute("TRUNCATE related_topic")
+
+        with cur.copy(
+            "COPY related_topic (resolved_topic_id, rank, related_topic_id, shared_findings, score) FROM STDIN"
+        ) as related_topic_copy:
+            for start in tqdm(range(0, len(topic_ids), block_size)):
+                # shared finding counts between this block and every topic
+                shared = (incidence[start : start + block_size] @ incidence_t).tocsr()
+
+                for i in range(shared.shape[0]):
+                    topic = start + i
+                    row = slice(shared.indptr[i], shared.indptr[i + 1])
+                    related, counts = shared.indices[row], shared.data[row]
+
+                    not_self = related != topic
+                    related, counts = related[not_self], counts[not_self]
+
+                    scores = counts / (
+                        finding_counts[topic] + finding_counts[related] - counts
+                    )
+
+                    # by score, then shared findings, descending
+                    top = np.lexsort((-counts, -scores))[:top_k]
 
-            with cur.copy(
-                "COPY topic_finding (topic_id, finding_id, resolved_topic_id) FROM STDIN"
-            ) as topic_finding_copy:
-                with NdjsonReader(
-                    Path("data/processed/processed_topic_finding_models.jsonl"),
-                    ProcessedTopicFindingModel,
-                ) as f:
-                    for line in tqdm(f):
-                        topic_finding_copy.write_row(
+                    for rank, j in enumerate(top, start=1):
+                        related_topic_copy.write_row(
                             (
-                                line.topic_id,
-                                line.finding_id,
-                                line.resolved_topic_id,
+                                topic_ids[topic],
+                                rank,
+                                topic_ids[related[j]],
+                                int(counts[j]),
+                                float(scores[j]),
                             )
                         )
 
@@ -407,12 +533,12 @@ def load_vespa():
         }
 
     def feed_iter():
-        with NdjsonReader(
-            Path("data/processed/resolved_topic_models.jsonl"),
+        with ParquetReader(
+            Path("data/processed/resolved_topic_models.parquet"),
             ResolvedTopicModel,
         ) as f:
             # resolved_topics = list(f)
-            for topic in tqdm(f):
+            for topic in tqdm(f, total=len(f)):
                 yield map_fn(topic)
 
     def callback(response: VespaResponse, id: str):
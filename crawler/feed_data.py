@@ -6,6 +6,7 @@ from pathlib import Path
 from generate_data import PaperAnalysisRun
 from tqdm import tqdm
 from crawler.types import process_response
+from crawler.serializers import NdjsonReader
 from vespa.io import VespaResponse
 
 # %%
@@ -17,18 +18,9 @@ PROCESSED_DATA_DIR = DATA_DIR / "processed"
 RESPONSES = PROCESSED_DATA_DIR / "merged.jsonl"
 
 # %%
-# with open(RESPONSES, "r") as f:
-#     total_lines = sum(1 for line in f)
 
-total_lines = 53389
-
-# %%
-
-with open(RESPONSES, "r") as f:
-    lines = []
-    for line in tqdm(f, total=total_lines, desc="Processing"):
-        processed_line = PaperAnalysisRun.model_validate_json(line)
-        lines.append(processed_line)
+with NdjsonReader(RESPONSES, PaperAnalysisRun, validate=True) as f:
+    lines = list(tqdm(f, total=f.count(), desc="Processing"))
 
 # %%
 INTERNAL_DB_CONNECTION_STR = "dbname='mydb' user='myuser' host='localhost' password='mysecretpassword' port='5432'"
@@ -13,7 +13,7 @@ from crawler.types import (
 from loguru import logger
 import httpx
 import dotenv
-from crawler.serializers import NdjsonReader
+from crawler.serializers import NdjsonReader, NdjsonWriter
 from pathlib import Path
 import random
 from tqdm import tqdm
@@ -69,17 +69,18 @@ def prepare():
     prompts: list[PaperAnalysisPrompt] = []
 
     with NdjsonReader(
-        Path("data/processed/cs_inlined_papers.jsonl"), ProcessedPaper, validate=True
+        Path("data/processed/cs_inlined_papers.jsonl.zst"),
+        ProcessedPaper,
+        validate=True,
     ) as f:
         for p in tqdm(f):
             if random.random() < sample_rate:
                 prompt = PaperAnalysisPrompt(paper=p)
                 prompts.append(prompt)
 
-    with open("data/raw/finetune_prompts.jsonl", "w") as f:
+    with NdjsonWriter("data/raw/finetune_prompts.jsonl", PaperAnalysisPrompt) as f:
         for prompt in prompts:
-            f.write(prompt.model_dump_json())
-            f.write("\n")
+            f.write(prompt)
 
 
 def run_prompt(prompt: PaperAnalysisPrompt):
@@ -104,17 +105,31 @@ def execute():
         for prompt in f:
             prompts.append(prompt)
 
+    # Responses are paid for, so a rerun resumes an interrupted one: prompts
+    # already answered are skipped and new responses appended.
+    responses_path = Path("data/raw/finetune_responses.jsonl")
+    if responses_path.exists():
+        with NdjsonReader(
+            responses_path, PaperAnalysisRun, validate=True, strict=False
+        ) as f:
+            answered = {run.prompt.paper.paper_id for run in f}
+
+        prompts = [p for p in prompts if p.paper.paper_id not in answered]
+        logger.info(f"Resuming with {len(prompts)} prompts left")
+
     num_failed = 0
 
-    with open("data/raw/finetune_responses.jsonl", "w") as f:
+    # every response is written as soon as it arrives
+    with NdjsonWriter(
+        responses_path, PaperAnalysisRun, buffer_size=0, atomic=False, append=True
+    ) as f:
         with ThreadPool(32) as pool:
             for response in tqdm(pool.imap_unordered(run_prompt, prompts)):
                 if response is None:
                     num_failed += 1
                     logger.warning("Error processing prompt")
                     continue
-                f.write(response.model_dump_json())
-                f.write("\n")
+                f.write(response)
 
     logger.info(f"Failed to process {num_failed} prompts")
 
@@ -1,7 +1,8 @@
 # %%
 from pathlib import Path
+import shutil
 import click
-from crawler.serializers import NdjsonReader
+from crawler.serializers import NdjsonReader, NdjsonWriter, dump_line
 from loguru import logger
 import multiprocessing
 from crawler.types import Paper, InlinedParagraph, ProcessedPaper
@@ -78,9 +79,14 @@ def inline(paper: Paper) -> list[InlinedParagraph]:
 
 
 def process_path(path: Path):
-    output_path = Path("data/processed/inlined_papers") / path.name
-
-    with open(output_path, "w") as f_out:
+    output_path = Path("data/processed/inlined_papers") / (
+        path.name.removesuffix(".zst") + ".zst"
+    )
+
+    # compressed on the calling thread, as a file is processed per core
+    with NdjsonWriter(
+        output_path, ProcessedPaper, exclude_none=True, threads=0
+    ) as f_out:
         with NdjsonReader(path, Paper, validate=True) as f:
             for paper in f:
                 try:
@@ -98,8 +104,7 @@ def process_path(path: Path):
                     inlined_texts=inlined_texts,
                 )
                 # yield processed_paper
-                f_out.write(processed_paper.model_dump_json(exclude_none=True))
-                f_out.write("\n")
+                f_out.write(processed_paper)
 
     return output_path
 
@@ -111,7 +116,8 @@ def cli():
 
 @cli.command()
 def process():
-    paths = list(Path("data/raw/unarXive_230324_open_subset").rglob("*.jsonl"))
+    raw_dir = Path("data/raw/unarXive_230324_open_subset")
+    paths = [*raw_dir.rglob("*.jsonl"), *raw_dir.rglob("*.jsonl.zst")]
 
     logger.info(f"Processing {len(paths)} files")
     with multiprocessing.Pool(multiprocessing.cpu_count()) as pool:
@@ -121,23 +127,33 @@ def process():
 
 @cli.command()
 def merge():
-    processed_paths = list(Path("data/processed/inlined_papers").rglob("*.jsonl"))
-    with open("data/processed/inlined_papers.jsonl", "w") as f_out:
+    processed_paths = list(Path("data/processed/inlined_papers").rglob("*.jsonl.zst"))
+    # concatenated zstd frames decompress as one stream, so the compressed
+    # files are merged as they are
+    with open("data/processed/inlined_papers.jsonl.zst", "wb") as f_out:
         for path in tqdm(processed_paths, desc="Merging"):
-            with open(path, "r") as f:
-                for line in f:
-                    f_out.write(line)
+            with open(path, "rb") as f:
+                shutil.copyfileobj(f, f_out)
+
+
+def cs_papers(papers: list[ProcessedPaper]) -> bytes:
+    return b"".join(
+        dump_line(paper, exclude_none=True)
+        for paper in papers
+        if paper.metadata.categories.startswith("cs.")
+    )
 
 
 @cli.command()
 def filter():
     with NdjsonReader(
-        Path("data/processed/inlined_papers.jsonl"), ProcessedPaper, validate=True
-    ) as r, open("data/processed/cs_inlined_papers.jsonl", "w") as w:
-        for paper in tqdm(r, desc="Filtering"):
-            if paper.metadata.categories.startswith("cs."):
-                w.write(paper.model_dump_json(exclude_none=True))
-                w.write("\n")
+        Path("data/processed/inlined_papers.jsonl.zst"), ProcessedPaper, validate=True
+    ) as r, NdjsonWriter(
+        "data/processed/cs_inlined_papers.jsonl.zst", ProcessedPaper
+    ) as w:
+        # parsed, filtered and serialized in parallel, in blocks of papers
+        for lines in tqdm(r.map_batches(cs_papers), desc="Filtering"):
+            w.write_lines(lines)
 
 
 if __name__ == "__main__":
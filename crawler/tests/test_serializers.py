@@ -0,0 +1,182 @@
+import io
+import os
+
+import pytest
+from pydantic import BaseModel
+
+from crawler.serializers import (
+    NdjsonReader,
+    NdjsonWriter,
+    ParquetReader,
+    ParquetWriter,
+    line_offsets,
+    open_file,
+    read_blocks,
+)
+
+
+class Record(BaseModel):
+    id: int
+    name: str
+
+
+RECORDS = [Record(id=i, name=f"record {i}" * (i % 5)) for i in range(100)]
+
+
+def write_records(path, records=RECORDS):
+    with NdjsonWriter(path, Record, buffer_size=256) as f:
+        for record in records:
+            f.write(record)
+
+
+def test_read_blocks_end_at_line_breaks():
+    data = b"".join(f"line {i}\n".encode() for i in range(50))
+    blocks = list(read_blocks(io.BytesIO(data), block_size=16))
+
+    assert b"".join(blocks) == data
+    assert all(block.endswith(b"\n") for block in blocks)
+
+
+def test_read_blocks_keeps_lines_longer_than_a_block():
+    data = b"short\n" + b"x" * 100 + b"\nlast"
+    blocks = list(read_blocks(io.BytesIO(data), block_size=16))
+
+    assert blocks == [b"short\n", b"x" * 100 + b"\n", b"last"]
+
+
+def test_read_blocks_stops_at_end():
+    data = b"a\nb\nc\nd\n"
+    file = io.BytesIO(data)
+    file.seek(2)
+
+    assert b"".join(read_blocks(file, block_size=3, end=6)) == b"b\nc\n"
+
+
+@pytest.mark.parametrize("name", ["records.jsonl", "records.jsonl.zst"])
+def test_round_trip(tmp_path, name):
+    path = tmp_path / name
+    write_records(path)
+
+    with NdjsonReader(path, Record, validate=True) as f:
+        assert list(f) == RECORDS
+    with NdjsonReader(path, Record) as f:
+        assert [
+            model for batch in f.batches(block_size=64, workers=2) for model in batch
+        ] == RECORDS
+    assert sorted(os.listdir(tmp_path)) == [name]
+
+
+def test_zstd_files_are_compressed(tmp_path):
+    path = tmp_path / "records.jsonl.zst"
+    write_records(path)
+
+    assert path.read_bytes()[:4] == b"\x28\xb5\x2f\xfd"
+    with open_file(path, "rb") as f:
+        assert f.read().count(b"\n") == len(RECORDS)
+
+
+def test_count_and_seek(tmp_path):
+    path = tmp_path / "records.jsonl"
+    write_records(path)
+
+    with NdjsonReader(path, Record) as f:
+        assert f.count() == len(RECORDS)
+        f.seek(40)
+        assert next(iter(f)) == RECORDS[40]
+
+
+def test_line_offsets_sidecar_is_rebuilt_when_the_file_changes(tmp_path):
+    path = tmp_path / "records.jsonl"
+    write_records(path, RECORDS[:10])
+    assert len(line_offsets(path)) == 11
+    assert (tmp_path / "records.jsonl.offsets.npy").exists()
+
+    with path.open("ab") as f:
+        f.write(b'{"id": 10, "name": "no line break"}')
+
+    assert len(line_offsets(path)) == 12
+
+
+def test_shards_cover_every_line_once(tmp_path):
+    path = tmp_path / "records.jsonl"
+    write_records(path)
+
+    with NdjsonReader(path, Record) as f:
+        shards = f.shards(3)
+
+    assert len(shards) == 3
+    assert shards[0][0] == 0
+    assert shards[-1][1] == path.stat().st_size
+
+    read = []
+    for byte_range in shards:
+        with NdjsonReader(path, Record, byte_range=byte_range) as f:
+            shard = list(f)
+            assert f.count() == len(shard)
+            read += shard
+
+    assert read == RECORDS
+
+
+def test_writer_is_atomic(tmp_path):
+    path = tmp_path / "records.jsonl"
+    write_records(path, RECORDS[:10])
+
+    with pytest.raises(RuntimeError), NdjsonWriter(path, Record, buffer_size=0) as f:
+        f.write(RECORDS[50])
+        raise RuntimeError
+
+    with NdjsonReader(path, Record) as f:
+        assert list(f) == RECORDS[:10]
+    assert sorted(os.listdir(tmp_path)) == ["records.jsonl"]
+
+
+def test_writer_appends_after_a_cut_off_line(tmp_path):
+    path = tmp_path / "records.jsonl"
+    write_records(path, RECORDS[:10])
+    with path.open("ab") as f:
+        f.write(b'{"id": 10, "na')
+
+    with NdjsonWriter(path, Record, atomic=False, append=True) as f:
+        for record in RECORDS[11:20]:
+            f.write(record)
+
+    with NdjsonReader(path, Record, validate=True, strict=False) as f:
+        assert list(f) == RECORDS[:10] + RECORDS[11:20]
+
+
+def test_atomic_append_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        NdjsonWriter(tmp_path / "records.jsonl", Record, append=True)
+
+
+def test_parquet_round_trip(tmp_path):
+    path = tmp_path / "records.parquet"
+    with ParquetWriter(path, Record, row_group_size=30) as f:
+        for record in RECORDS:
+            f.write(record)
+
+    with ParquetReader(path, Record) as f:
+        assert len(f) == len(RECORDS)
+        assert list(f) == RECORDS
+        assert list(f.rows()) == [(r.id, r.name) for r in RECORDS]
+
+
+def test_parquet_rows_follow_requested_columns(tmp_path):
+    path = tmp_path / "records.parquet"
+    with ParquetWriter(path, Record) as f:
+        for record in RECORDS:
+            f.write(record)
+
+    with ParquetReader(path, Record, columns=["name", "id"]) as f:
+        assert list(f.rows()) == [(r.name, r.id) for r in RECORDS]
+
+
+def test_parquet_writer_is_atomic(tmp_path):
+    path = tmp_path / "records.parquet"
+
+    with pytest.raises(RuntimeError), ParquetWriter(path, Record) as f:
+        f.write(RECORDS[0])
+        raise RuntimeError
+
+    assert os.listdir(tmp_path) == []
@@ -1,5 +1,9 @@
+-- Rows are identified by prefixed string ids; the BIGINT `key`s are
+-- surrogates that topic_finding is indexed and joined on (see
+-- db/migrations/0002_surrogate_keys.sql).
 CREATE TABLE IF NOT EXISTS resolved_topic (
     id TEXT PRIMARY KEY,
+    key BIGINT GENERATED ALWAYS AS IDENTITY UNIQUE,
     name TEXT,
     slug TEXT,
     description TEXT,
@@ -9,6 +13,7 @@ CREATE TABLE IF NOT EXISTS resolved_topic (
 
 CREATE TABLE IF NOT EXISTS topic (
     id TEXT PRIMARY KEY,
+    key BIGINT GENERATED ALWAYS AS IDENTITY UNIQUE,
     name TEXT,
     slug TEXT,
     description TEXT,
@@ -30,25 +35,113 @@ CREATE TABLE IF NOT EXISTS paper (
 
 CREATE TABLE IF NOT EXISTS finding (
     id TEXT PRIMARY KEY,
+    key BIGINT GENERATED ALWAYS AS IDENTITY UNIQUE,
     name TEXT,
     slug TEXT,
     description TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    paper_id TEXT,
+    FOREIGN KEY (paper_id) REFERENCES paper(id)
 );
 
-ALTER TABLE finding
-ADD COLUMN paper_id TEXT,
-ADD FOREIGN KEY (paper_id) REFERENCES paper(id);
-
+-- Edges are stored by the surrogate keys of their ids alone; readers join
+-- back to the string ids. Writers look the keys up with one join per load (see
+-- `deduplicate_and_load.py load_postgres`).
 CREATE TABLE IF NOT EXISTS topic_finding (
-    topic_id TEXT NOT NULL,
-    finding_id TEXT NOT NULL,
-    resolved_topic_id TEXT NOT NULL,
-    PRIMARY KEY (topic_id, finding_id),
-    FOREIGN KEY (topic_id) REFERENCES topic (id),
-    FOREIGN KEY (finding_id) REFERENCES finding (id),
+    topic_key BIGINT NOT NULL,
+    finding_key BIGINT NOT NULL,
+    resolved_topic_key BIGINT NOT NULL,
+    PRIMARY KEY (topic_key, finding_key),
+    FOREIGN KEY (topic_key) REFERENCES topic (key),
+    FOREIGN KEY (finding_key) REFERENCES finding (key),
+    FOREIGN KEY (resolved_topic_key) REFERENCES resolved_topic (key)
+);
+-- Edges of resolved topics and of findings, INCLUDing the other keys so
+-- lookups are index-only.
+CREATE INDEX IF NOT EXISTS topic_finding_resolved_topic_key_idx
+    ON topic_finding(resolved_topic_key) INCLUDE (finding_key, topic_key);
+CREATE INDEX IF NOT EXISTS topic_finding_finding_key_idx
+    ON topic_finding(finding_key) INCLUDE (resolved_topic_key, topic_key);
+
+-- Number of topic_finding rows of each resolved topic. Maintained by the
+-- triggers below as rows are inserted or deleted (they are never updated), so
+-- loading a batch of papers only touches the degrees of the topics in it (see
+-- db/migrations/0005_topic_degree_count.sql).
+CREATE TABLE IF NOT EXISTS topic_degree_count (
+    resolved_topic_id TEXT PRIMARY KEY,
+    type TEXT,
+    degree BIGINT NOT NULL,
     FOREIGN KEY (resolved_topic_id) REFERENCES resolved_topic (id)
 );
-CREATE INDEX topic_finding_topic_id_idx ON topic_finding(topic_id text_ops);
-CREATE INDEX topic_finding_finding_id_idx ON topic_finding(finding_id text_ops);
-CREATE INDEX topic_finding_resolved_topic_id_idx ON topic_finding(resolved_topic_id text_ops);
\ No newline at end of file
+
+-- Serves the keyset-paginated /graph scan, ordered by degree then id, and
+-- filters on type as it goes when restricted to several types.
+CREATE INDEX IF NOT EXISTS topic_degree_count_degree_covering_idx
+    ON topic_degree_count(degree, resolved_topic_id) INCLUDE (type);
+-- Same scan restricted to topic types.
+CREATE INDEX IF NOT EXISTS topic_degree_count_type_degree_idx ON topic_degree_count(type, degree, resolved_topic_id);
+
+-- Statement-level, so a COPY of a whole batch does one grouped upsert.
+CREATE OR REPLACE FUNCTION topic_degree_count_insert() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO topic_degree_count (resolved_topic_id, type, degree)
+    SELECT rt.id, rt.type, COUNT(*)
+    FROM new_rows n
+    JOIN resolved_topic rt ON rt.key = n.resolved_topic_key
+    GROUP BY rt.id, rt.type
+    ON CONFLICT (resolved_topic_id)
+    DO UPDATE SET degree = topic_degree_count.degree + EXCLUDED.degree;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION topic_degree_count_delete() RETURNS trigger AS $$
+BEGIN
+    UPDATE topic_degree_count tdc
+    SET degree = tdc.degree - o.removed
+    FROM (
+        SELECT rt.id AS resolved_topic_id, COUNT(*) AS removed
+        FROM old_rows o
+        JOIN resolved_topic rt ON rt.key = o.resolved_topic_key
+        GROUP BY rt.id
+    ) o
+    WHERE tdc.resolved_topic_id = o.resolved_topic_id;
+
+    DELETE FROM topic_degree_count WHERE degree <= 0;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER topic_finding_degree_insert
+AFTER INSERT ON topic_finding
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION topic_degree_count_insert();
+
+CREATE OR REPLACE TRIGGER topic_finding_degree_delete
+AFTER DELETE ON topic_finding
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION topic_degree_count_delete();
+
+-- Each resolved topic's most related topics, ranked by the Jaccard similarity
+-- of their findings. Written by `deduplicate_and_load.py compute_related_topics`
+-- (see db/migrations/0006_related_topic.sql).
+CREATE TABLE IF NOT EXISTS related_topic (
+    resolved_topic_id TEXT NOT NULL,
+    rank INT NOT NULL,
+    related_topic_id TEXT NOT NULL,
+    shared_findings INT NOT NULL,
+    score REAL NOT NULL,
+    PRIMARY KEY (resolved_topic_id, rank),
+    FOREIGN KEY (resolved_topic_id) REFERENCES resolved_topic (id),
+    FOREIGN KEY (related_topic_id) REFERENCES resolved_topic (id)
+);
+
+-- Bumped by `deduplicate_and_load.py load_postgres` after every load so the
+-- server can tell when its cached graph is stale (see
+-- db/migrations/0004_data_version.sql).
+CREATE TABLE IF NOT EXISTS data_version (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+INSERT INTO data_version (id, version) VALUES (TRUE, 0) ON CONFLICT DO NOTHING;
@@ -0,0 +1,12 @@
+-- Indexes for the server's read paths. Each covering index INCLUDEs the
+-- columns its query selects, so those lookups are answered by index-only
+-- scans without visiting the heap. topic_finding is indexed by the
+-- surrogate keys of db/migrations/0002_surrogate_keys.sql.
+
+-- Foreign keys looked up from the referenced side.
+CREATE INDEX IF NOT EXISTS finding_paper_id_idx ON finding(paper_id);
+CREATE INDEX IF NOT EXISTS topic_resolved_topic_id_idx ON topic(resolved_topic_id);
+
+-- The /graph findings are looked up by finding_pkey. topic_degree_count's
+-- indexes are created with the table, by
+-- db/migrations/0005_topic_degree_count.sql.
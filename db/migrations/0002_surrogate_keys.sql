@@ -0,0 +1,62 @@
+-- BIGINT surrogate keys for resolved topics, topics and findings. Their
+-- prefixed string ids stay the external ids the API and the pipeline use;
+-- topic_finding stores only the keys, as 8-byte integers instead of ~50-byte
+-- strings, and is indexed, joined and exported to the graph index by them.
+-- db/init.sql creates databases with them already.
+
+ALTER TABLE resolved_topic ADD COLUMN IF NOT EXISTS key BIGINT GENERATED ALWAYS AS IDENTITY UNIQUE;
+ALTER TABLE topic ADD COLUMN IF NOT EXISTS key BIGINT GENERATED ALWAYS AS IDENTITY UNIQUE;
+ALTER TABLE finding ADD COLUMN IF NOT EXISTS key BIGINT GENERATED ALWAYS AS IDENTITY UNIQUE;
+
+-- Replaces the string ids of topic_finding by their keys. Dropping the id
+-- columns drops their primary key, foreign keys and indexes along with them;
+-- the topic_degree_count materialized view of older databases reads
+-- resolved_topic_id, so it goes first (db/migrations/0005 replaces it with a
+-- table).
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT FROM information_schema.columns
+        WHERE table_name = 'topic_finding' AND column_name = 'topic_id'
+    ) THEN
+        DROP MATERIALIZED VIEW IF EXISTS topic_degree_count;
+
+        ALTER TABLE topic_finding
+        ADD COLUMN topic_key BIGINT,
+        ADD COLUMN finding_key BIGINT,
+        ADD COLUMN resolved_topic_key BIGINT;
+
+        UPDATE topic_finding tf
+        SET
+            topic_key = t.key,
+            finding_key = f.key,
+            resolved_topic_key = rt.key
+        FROM topic t, finding f, resolved_topic rt
+        WHERE t.id = tf.topic_id
+            AND f.id = tf.finding_id
+            AND rt.id = tf.resolved_topic_id;
+
+        ALTER TABLE topic_finding
+        DROP COLUMN topic_id,
+        DROP COLUMN finding_id,
+        DROP COLUMN resolved_topic_id,
+        ALTER COLUMN topic_key SET NOT NULL,
+        ALTER COLUMN finding_key SET NOT NULL,
+        ALTER COLUMN resolved_topic_key SET NOT NULL,
+        ADD PRIMARY KEY (topic_key, finding_key),
+        ADD FOREIGN KEY (topic_key) REFERENCES topic (key),
+        ADD FOREIGN KEY (finding_key) REFERENCES finding (key),
+        ADD FOREIGN KEY (resolved_topic_key) REFERENCES resolved_topic (key);
+    END IF;
+END $$;
+
+-- Writers look the keys of the string ids up with one join per load (see
+-- `deduplicate_and_load.py load_postgres`) rather than per row.
+
+-- Edges of resolved topics and of findings. Each INCLUDEs the other keys, so
+-- the read paths' lookups are index-only. Lookups by topic are served by the
+-- (topic_key, finding_key) primary key.
+CREATE INDEX IF NOT EXISTS topic_finding_resolved_topic_key_idx
+    ON topic_finding(resolved_topic_key) INCLUDE (finding_key, topic_key);
+CREATE INDEX IF NOT EXISTS topic_finding_finding_key_idx
+    ON topic_finding(finding_key) INCLUDE (resolved_topic_key, topic_key);
@@ -0,0 +1,17 @@
+-- Full-text search over resolved topics in Postgres, for deployments that
+-- run /search without Vespa (SEARCH_BACKEND=postgres). Names weigh more
+-- than descriptions in the ranking; trigram matching on names catches
+-- misspelled and partial queries the word index misses.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE resolved_topic
+ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('english', coalesce(name, '')), 'A')
+    || setweight(to_tsvector('english', coalesce(description, '')), 'B')
+) STORED;
+
+CREATE INDEX IF NOT EXISTS resolved_topic_search_vector_idx
+    ON resolved_topic USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS resolved_topic_name_trgm_idx
+    ON resolved_topic USING GIN (name gin_trgm_ops);
@@ -0,0 +1,10 @@
+-- A single row counting data loads. `deduplicate_and_load.py load_postgres`
+-- bumps it after every load; the server polls it to rebuild its graph state
+-- and to key its topic cache.
+
+CREATE TABLE IF NOT EXISTS data_version (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+INSERT INTO data_version (id, version) VALUES (TRUE, 0) ON CONFLICT DO NOTHING;
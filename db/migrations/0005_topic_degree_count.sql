@@ -0,0 +1,73 @@
+-- topic_degree_count as a table kept up to date by triggers on topic_finding,
+-- replacing the materialized view that had to be refreshed after every load.
+-- db/migrations/0002 already dropped the view of older databases; the table
+-- is backfilled with the degrees it held, along with each topic's type for
+-- the /graph type filter.
+
+CREATE TABLE IF NOT EXISTS topic_degree_count (
+    resolved_topic_id TEXT PRIMARY KEY,
+    type TEXT,
+    degree BIGINT NOT NULL,
+    FOREIGN KEY (resolved_topic_id) REFERENCES resolved_topic (id)
+);
+
+-- The keyset-paginated /graph scan, ordered by degree then id, filtering on
+-- type as it goes when restricted to several types.
+CREATE INDEX IF NOT EXISTS topic_degree_count_degree_covering_idx
+    ON topic_degree_count(degree, resolved_topic_id) INCLUDE (type);
+-- Same scan restricted to topic types.
+CREATE INDEX IF NOT EXISTS topic_degree_count_type_degree_idx
+    ON topic_degree_count(type, degree, resolved_topic_id);
+
+-- Statement-level, so a COPY of a whole batch does one grouped upsert.
+CREATE OR REPLACE FUNCTION topic_degree_count_insert() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO topic_degree_count (resolved_topic_id, type, degree)
+    SELECT rt.id, rt.type, COUNT(*)
+    FROM new_rows n
+    JOIN resolved_topic rt ON rt.key = n.resolved_topic_key
+    GROUP BY rt.id, rt.type
+    ON CONFLICT (resolved_topic_id)
+    DO UPDATE SET degree = topic_degree_count.degree + EXCLUDED.degree;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION topic_degree_count_delete() RETURNS trigger AS $$
+BEGIN
+    UPDATE topic_degree_count tdc
+    SET degree = tdc.degree - o.removed
+    FROM (
+        SELECT rt.id AS resolved_topic_id, COUNT(*) AS removed
+        FROM old_rows o
+        JOIN resolved_topic rt ON rt.key = o.resolved_topic_key
+        GROUP BY rt.id
+    ) o
+    WHERE tdc.resolved_topic_id = o.resolved_topic_id;
+
+    DELETE FROM topic_degree_count WHERE degree <= 0;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Creating the triggers locks topic_finding against writes until this
+-- migration commits, so no load lands between them and the backfill.
+CREATE OR REPLACE TRIGGER topic_finding_degree_insert
+AFTER INSERT ON topic_finding
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION topic_degree_count_insert();
+
+CREATE OR REPLACE TRIGGER topic_finding_degree_delete
+AFTER DELETE ON topic_finding
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION topic_degree_count_delete();
+
+-- Recomputes every degree, which leaves a table the triggers already
+-- maintain unchanged.
+INSERT INTO topic_degree_count (resolved_topic_id, type, degree)
+SELECT rt.id, rt.type, COUNT(*)
+FROM topic_finding tf
+JOIN resolved_topic rt ON rt.key = tf.resolved_topic_key
+GROUP BY rt.id, rt.type
+ON CONFLICT (resolved_topic_id)
+DO UPDATE SET type = EXCLUDED.type, degree = EXCLUDED.degree;
@@ -0,0 +1,15 @@
+-- Each resolved topic's most related topics, ranked by the Jaccard similarity
+-- of their findings. Written by `deduplicate_and_load.py
+-- compute_related_topics`, read by /topic/{topic_id}/related through the
+-- primary key.
+
+CREATE TABLE IF NOT EXISTS related_topic (
+    resolved_topic_id TEXT NOT NULL,
+    rank INT NOT NULL,
+    related_topic_id TEXT NOT NULL,
+    shared_findings INT NOT NULL,
+    score REAL NOT NULL,
+    PRIMARY KEY (resolved_topic_id, rank),
+    FOREIGN KEY (resolved_topic_id) REFERENCES resolved_topic (id),
+    FOREIGN KEY (related_topic_id) REFERENCES resolved_topic (id)
+);
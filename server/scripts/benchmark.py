@@ -0,0 +1,391 @@
+"""
+Load-testing benchmark for the server's hot paths.
+
+Seeds a scratch Postgres database from db/init.sql and db/migrations with
+a synthetic graph whose topic degrees follow a power law, starts a fake
+Vespa, runs the server under uvicorn against both, and reports latency
+percentiles and throughput per endpoint under concurrent load.
+
+    poetry run python -m scripts.benchmark --papers 5000 --concurrency 32
+
+The database named by --bench-db is dropped and recreated on every run.
+"""
+
+import argparse
+import asyncio
+import bisect
+import datetime
+import itertools
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from uuid import uuid4
+
+import httpx
+import psycopg
+import uvicorn
+from fastapi import FastAPI
+from psycopg.conninfo import make_conninfo
+
+from scripts.migrate import migrate
+from server.config import INTERNAL_DB_CONNECTION_STR
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+INIT_SQL = SERVER_DIR.parent / "db" / "init.sql"
+
+TOPIC_TYPES = ["task", "benchmark", "architecture", "model", "method", "dataset"]
+WORDS = [
+    "neural", "graph", "language", "vision", "transformer", "attention",
+    "learning", "network", "model", "retrieval", "generation", "embedding",
+    "reinforcement", "diffusion", "segmentation", "translation", "speech",
+    "contrastive", "sparse", "adversarial", "federated", "quantization",
+]  # fmt: skip
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def topic_name(rng: random.Random, i: int) -> str:
+    return f"{' '.join(rng.sample(WORDS, rng.randint(1, 3))).title()} {i}"
+
+
+def seed_database(dsn: str, papers: int, topics: int, alpha: float, seed: int):
+    """
+    Loads a synthetic graph shaped like the real pipeline's output: each
+    paper has a few findings, and each paper mentions a few resolved topics
+    drawn from a Zipf distribution, producing one raw topic per mention
+    linked to some of the paper's findings.
+    """
+    rng = random.Random(seed)
+    now = datetime.datetime.now()
+
+    resolved_topics = [
+        (f"resolved_topic:{uuid4()}", topic_name(rng, i), rng.choice(TOPIC_TYPES))
+        for i in range(topics)
+    ]
+    cum_weights = list(
+        itertools.accumulate(1 / (rank + 1) ** alpha for rank in range(topics))
+    )
+
+    with psycopg.connect(dsn, autocommit=True) as conn:
+        conn.execute(INIT_SQL.read_text())
+        migrate(conn)
+
+    with psycopg.connect(dsn) as conn, conn.cursor() as cur:
+        with cur.copy(
+            "COPY resolved_topic (id, name, type, slug, description, created_at) FROM STDIN"
+        ) as copy:
+            for topic_id, name, type in resolved_topics:
+                slug = name.lower().replace(" ", "_")
+                copy.write_row((topic_id, name, type, slug, f"About {name}.", now))
+
+        paper_rows, finding_rows, topic_rows, edge_rows = [], [], [], []
+
+        for p in range(papers):
+            paper_id = f"{2000 + p // 1000}.{p:05d}"
+            paper_rows.append(
+                (
+                    paper_id,
+                    "A. Author, B. Author",
+                    f"Paper {p}",
+                    now,
+                    "Abstract " * 50,
+                    now,
+                )
+            )
+
+            finding_ids = [f"finding:{uuid4()}" for _ in range(rng.randint(2, 6))]
+            for finding_id in finding_ids:
+                finding_rows.append(
+                    (
+                        finding_id,
+                        f"Finding {finding_id[-6:]}",
+                        "finding",
+                        "Finding " * 20,
+                        paper_id,
+                        now,
+                    )
+                )
+
+            mentioned = {
+                bisect.bisect_left(cum_weights, rng.random() * cum_weights[-1])
+                for _ in range(rng.randint(1, 8))
+            }
+            for t in mentioned:
+                resolved_topic_id, name, type = resolved_topics[t]
+                topic_id = f"topic:{uuid4()}"
+                topic_rows.append(
+                    (
+                        topic_id,
+                        name,
+                        type,
+                        name.lower(),
+                        f"About {name}.",
+                        now,
+                        resolved_topic_id,
+                    )
+                )
+                for finding_id in rng.sample(
+                    finding_ids, rng.randint(1, len(finding_ids))
+                ):
+                    edge_rows.append((topic_id, finding_id, resolved_topic_id))
+
+        cur.execute(
+            "CREATE TEMP TABLE topic_finding_staging (topic_id TEXT, finding_id TEXT, resolved_topic_id TEXT) ON COMMIT DROP"
+        )
+        for statement, rows in [
+            ("COPY paper (id, authors, title, update_date, abstract, created_at) FROM STDIN", paper_rows),
+            ("COPY finding (id, name, slug, description, paper_id, created_at) FROM STDIN", finding_rows),
+            ("COPY topic (id, name, type, slug, description, created_at, resolved_topic_id) FROM STDIN", topic_rows),
+            ("COPY topic_finding_staging (topic_id, finding_id, resolved_topic_id) FROM STDIN", edge_rows),
+        ]:  # fmt: skip
+            with cur.copy(statement) as copy:
+                for row in rows:
+                    copy.write_row(row)
+
+        # as crawler/deduplicate_and_load.py load_postgres does
+        cur.execute(
+            """
+            INSERT INTO topic_finding (topic_key, finding_key, resolved_topic_key)
+            SELECT t.key, f.key, rt.key
+            FROM topic_finding_staging s
+            LEFT JOIN topic t ON t.id = s.topic_id
+            LEFT JOIN finding f ON f.id = s.finding_id
+            LEFT JOIN resolved_topic rt ON rt.id = s.resolved_topic_id
+            """
+        )
+
+        cur.execute("UPDATE data_version SET version = version + 1")
+
+    print(
+        f"Seeded {len(paper_rows)} papers, {len(finding_rows)} findings, "
+        f"{len(resolved_topics)} resolved topics, {len(edge_rows)} edges"
+    )
+
+
+def start_fake_vespa(port: int, hits: int):
+    """
+    Serves canned results from the Vespa query API in a background thread,
+    so /search measures the server's own overhead.
+    """
+    app = FastAPI()
+    rng = random.Random(0)
+    children = [
+        {
+            "id": f"id:codex:codex::{i}",
+            "relevance": 1.0 / (i + 1),
+            "fields": {
+                "id": f"resolved_topic:{uuid4()}",
+                "name": topic_name(rng, i),
+                "type": rng.choice(TOPIC_TYPES),
+                "description": "A synthetic topic returned by the fake Vespa.",
+            },
+        }
+        for i in range(hits)
+    ]
+
+    @app.post("/search/")
+    async def search():
+        return {"root": {"fields": {"totalCount": hits}, "children": children}}
+
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+
+    while not server.started:
+        time.sleep(0.05)
+
+
+def wait_for_server(base_url: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(base_url + "/", timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise TimeoutError(f"Server at {base_url} did not start")
+
+
+def load_targets(dsn: str, sample_size: int, seed: int) -> dict[str, list[dict]]:
+    """
+    Returns the request parameters to cycle through for each endpoint.
+    Topics are sampled in proportion to their degree, so hub topics are
+    requested more often, as on the real site.
+    """
+    rng = random.Random(seed)
+
+    with psycopg.connect(dsn) as conn:
+        rows = conn.execute(
+            "SELECT resolved_topic_id, degree FROM topic_degree_count"
+        ).fetchall()
+        names = [r[0] for r in conn.execute("SELECT name FROM resolved_topic")]
+
+    topic_ids = rng.choices(
+        [r[0] for r in rows], weights=[r[1] for r in rows], k=sample_size
+    )
+    prefixes = [rng.choice(names)[: rng.randint(1, 6)] for _ in range(sample_size)]
+
+    return {
+        "/topic": [{"topic_id": t} for t in topic_ids],
+        "/graph": [{}],
+        "/graph?live": [{"limit": 100, "min_degree": 2}],
+        "/search": [{"query": rng.choice(WORDS)} for _ in range(sample_size)],
+        "/suggest": [{"query": p} for p in prefixes],
+    }
+
+
+async def run_endpoint(
+    client: httpx.AsyncClient,
+    path: str,
+    params_list: list[dict],
+    requests: int,
+    concurrency: int,
+) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    counter = itertools.count()
+
+    async def worker():
+        nonlocal errors
+        while (i := next(counter)) < requests:
+            params = params_list[i % len(params_list)]
+            start = time.perf_counter()
+            try:
+                res = await client.get(path, params=params)
+                await res.aread()
+                if res.status_code != 200 or res.content.startswith(b'{"error"'):
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    quantiles = statistics.quantiles(latencies, n=100)
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_ms": quantiles[49] * 1000,
+        "p95_ms": quantiles[94] * 1000,
+        "p99_ms": quantiles[98] * 1000,
+    }
+
+
+async def run_benchmark(
+    base_url: str, targets: dict[str, list[dict]], requests: int, concurrency: int
+) -> dict[str, dict]:
+    results = {}
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(
+        base_url=base_url,
+        limits=limits,
+        timeout=60,
+        headers={"Accept-Encoding": "br, gzip"},
+    ) as client:
+        for name, params_list in targets.items():
+            path = name.split("?")[0]
+
+            # warm up connections, caches and query plans
+            await run_endpoint(client, path, params_list, concurrency * 2, concurrency)
+
+            results[name] = await run_endpoint(
+                client, path, params_list, requests, concurrency
+            )
+
+    return results
+
+
+def print_results(results: dict[str, dict]):
+    print(
+        f"{'endpoint':<14}{'requests':>10}{'errors':>8}{'req/s':>10}"
+        f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    )
+    for name, r in results.items():
+        print(
+            f"{name:<14}{r['requests']:>10}{r['errors']:>8}{r['throughput_rps']:>10.1f}"
+            f"{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--admin-dsn", default=INTERNAL_DB_CONNECTION_STR)
+    parser.add_argument("--bench-db", default="codex_bench")
+    parser.add_argument("--skip-seed", action="store_true")
+    parser.add_argument("--papers", type=int, default=2000)
+    parser.add_argument("--topics", type=int, default=5000)
+    parser.add_argument("--alpha", type=float, default=1.1, help="Zipf exponent")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--vespa-hits", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="Write results as JSON")
+    args = parser.parse_args()
+
+    bench_dsn = make_conninfo(args.admin_dsn, dbname=args.bench_db)
+
+    if not args.skip_seed:
+        with psycopg.connect(args.admin_dsn, autocommit=True) as conn:
+            conn.execute(f'DROP DATABASE IF EXISTS "{args.bench_db}"')
+            conn.execute(f'CREATE DATABASE "{args.bench_db}"')
+        seed_database(bench_dsn, args.papers, args.topics, args.alpha, args.seed)
+
+    vespa_port = free_port()
+    start_fake_vespa(vespa_port, args.vespa_hits)
+
+    server_port = free_port()
+    base_url = f"http://127.0.0.1:{server_port}"
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "server.main:app",
+            "--port",
+            str(server_port),
+            "--log-level",
+            "warning",
+        ],
+        cwd=SERVER_DIR,
+        env={
+            **os.environ,
+            "INTERNAL_DB_CONNECTION_STR": bench_dsn,
+            "VESPA_URL": f"http://127.0.0.1:{vespa_port}",
+        },
+    )
+
+    try:
+        wait_for_server(base_url)
+        targets = load_targets(bench_dsn, args.requests, args.seed)
+        results = asyncio.run(
+            run_benchmark(base_url, targets, args.requests, args.concurrency)
+        )
+    finally:
+        server.terminate()
+        server.wait()
+
+    print_results(results)
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Builds the topic-finding graph index for the current data version and saves
+it under GRAPH_INDEX_DIR, where the server memory-maps it instead of building
+it at startup. Run after `deduplicate_and_load.py load_postgres`:
+
+    GRAPH_INDEX_DIR=/data/graph_index poetry run python -m scripts.build_graph_index
+
+Indexes of older data versions are deleted, except the previous one, which
+running servers may still have mapped.
+"""
+
+import asyncio
+import shutil
+import sys
+from pathlib import Path
+
+from server.config import GRAPH_INDEX_DIR
+from server.db import create_pool, get_data_version
+from server.graph_index import build_graph_index, graph_index_path
+
+
+async def main():
+    if not GRAPH_INDEX_DIR:
+        sys.exit("GRAPH_INDEX_DIR is not set")
+
+    async with create_pool() as pool:
+        async with pool.connection() as conn, conn.cursor() as cur:
+            version = await get_data_version(cur)
+
+        graph_index = await build_graph_index(pool)
+
+    path = graph_index_path(version)
+    graph_index.save(path)
+    print(
+        f"Saved index of {len(graph_index.topic_ids)} topics, "
+        f"{len(graph_index.finding_ids)} findings and "
+        f"{len(graph_index.edge_topics)} edges to {path}"
+    )
+
+    versions = sorted(
+        int(p.name) for p in Path(GRAPH_INDEX_DIR).iterdir() if p.name.isdigit()
+    )
+    for old_version in versions[:-2]:
+        shutil.rmtree(graph_index_path(old_version))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
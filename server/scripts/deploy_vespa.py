@@ -1,6 +1,13 @@
 # %%
-from vespa.package import ApplicationPackage, Field, FieldSet
 from vespa.deployment import VespaDocker
+from vespa.package import (
+    ApplicationPackage,
+    DocumentSummary,
+    Field,
+    FieldSet,
+    RankProfile,
+    Summary,
+)
 
 # %%
 app_package = ApplicationPackage(name="codex")
@@ -42,6 +49,29 @@ app_package.schema.add_field_set(
     FieldSet(name="default", fields=["name", "slug", "description"])
 )
 
+# %%
+# Text relevance for /search, weighting matches in the name above the rest.
+app_package.schema.add_rank_profile(
+    RankProfile(
+        name="bm25",
+        first_phase="2 * bm25(name) + bm25(slug) + bm25(description)",
+    )
+)
+
+# %%
+# Only the fields the client renders for a search result.
+app_package.schema.add_document_summary(
+    DocumentSummary(
+        name="topic",
+        summary_fields=[
+            Summary(name="id", type="string"),
+            Summary(name="name", type="string"),
+            Summary(name="type", type="string"),
+            Summary(name="description", type="string"),
+        ],
+    )
+)
+
 # %%
 vespa_docker = VespaDocker()
 vespa_app = vespa_docker.deploy(application_package=app_package)
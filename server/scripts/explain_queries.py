@@ -0,0 +1,175 @@
+"""
+Runs EXPLAIN ANALYZE on every query the read endpoints issue against a
+seeded database (e.g. the benchmark's, `scripts.benchmark`), prints how
+each relation is scanned, and checks the plans use the indexes from
+db/migrations:
+
+    INTERNAL_DB_CONNECTION_STR=postgresql://.../codex_bench \\
+        poetry run python -m scripts.explain_queries
+
+Each query is also planned with sequential scans disabled, which shows
+whether indexes can serve it at all even where the planner prefers a scan
+for this data (e.g. queries reading much of a small table). Fails if that
+plan still scans a relation sequentially, or reads topic_finding or
+topic_degree_count (whose read paths are fully covered) with anything but
+an index-only scan or a primary key lookup. The database is vacuumed first
+so the visibility map lets index-only scans skip the heap.
+"""
+
+import argparse
+import asyncio
+import sys
+from typing import ClassVar
+
+from psycopg import AsyncConnection, AsyncCursor
+from psycopg.rows import dict_row, tuple_row
+
+from server.config import INTERNAL_DB_CONNECTION_STR, SEARCH_BACKEND
+from server.db import create_pool
+from server.graph import DEFAULT_MAX_DEGREE, query_graph
+from server.graph_index import build_graph_index
+from server.main import (
+    RELATED_TOPICS_QUERY,
+    TOPIC_BATCH_QUERY,
+    fetch_topic_neighborhood,
+)
+from server.metrics import query_label
+from server.search import search_topics_postgres
+from server.subgraph import query_subgraph
+
+# Relations every read path reaches through a covering index.
+COVERED_RELATIONS = {"topic_finding", "topic_degree_count"}
+
+
+class ExplainCursor(AsyncCursor):
+    """
+    Cursor that runs EXPLAIN ANALYZE on each query before executing it, and
+    plans it again without sequential scans, collecting (label, plan,
+    index plan) in `plans`.
+    """
+
+    plans: ClassVar[list[tuple[str, dict, dict]]] = []
+
+    async def execute(self, query, params=None, **kwargs):
+        async with AsyncCursor(self.connection, row_factory=tuple_row) as cur:
+            await cur.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + query, params)
+            ((plan,),) = await cur.fetchall()
+
+            await cur.execute("SET enable_seqscan = off")
+            await cur.execute("EXPLAIN (FORMAT JSON) " + query, params)
+            ((index_plan,),) = await cur.fetchall()
+            await cur.execute("RESET enable_seqscan")
+
+        self.plans.append((query_label(query), plan[0]["Plan"], index_plan[0]["Plan"]))
+
+        return await super().execute(query, params, **kwargs)
+
+
+def scans(plan: dict):
+    """
+    The scan nodes of a plan, depth first.
+    """
+    if "Relation Name" in plan:
+        yield plan
+    for child in plan.get("Plans", []):
+        yield from scans(child)
+
+
+def describe(node: dict) -> str:
+    description = f"{node['Node Type']} on {node['Relation Name']}"
+    if "Index Name" in node:
+        description += f" using {node['Index Name']}"
+    if "Heap Fetches" in node:
+        description += f" ({node['Heap Fetches']} heap fetches)"
+    return description
+
+
+def violation(node: dict) -> bool:
+    if node["Node Type"] == "Seq Scan":
+        return True
+    return (
+        node["Relation Name"] in COVERED_RELATIONS
+        and node["Node Type"] != "Index Only Scan"
+        and not node.get("Index Name", "").endswith("_pkey")
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--topics", type=int, default=10, help="Topics looked up, by degree"
+    )
+    args = parser.parse_args()
+
+    async with await AsyncConnection.connect(
+        INTERNAL_DB_CONNECTION_STR, autocommit=True
+    ) as conn:
+        await conn.execute("VACUUM ANALYZE")
+
+    async with create_pool() as pool:
+        graph_index = await build_graph_index(pool)
+
+    async with await AsyncConnection.connect(
+        INTERNAL_DB_CONNECTION_STR,
+        autocommit=True,
+        row_factory=dict_row,
+        cursor_factory=ExplainCursor,
+    ) as conn:
+        async with AsyncCursor(conn, row_factory=tuple_row) as cur:
+            # Well connected topics below the default /graph degree cap,
+            # rather than the few hubs no index can make cheap.
+            await cur.execute(
+                """
+                SELECT resolved_topic_id
+                FROM topic_degree_count
+                WHERE degree <= %s
+                ORDER BY degree DESC, resolved_topic_id
+                LIMIT %s;
+                """,
+                (DEFAULT_MAX_DEGREE, args.topics),
+            )
+            topic_ids = [topic_id for (topic_id,) in await cur.fetchall()]
+
+        if not topic_ids:
+            sys.exit("The database has no topics, seed it first")
+
+        cases = {
+            "/topic": lambda cur: fetch_topic_neighborhood(cur, topic_ids[0], None),
+            "/topic (indexed)": lambda cur: fetch_topic_neighborhood(
+                cur, topic_ids[0], graph_index
+            ),
+            "/topic/{topic_id}/related": lambda cur: cur.execute(
+                RELATED_TOPICS_QUERY, {"topic_id": topic_ids[0], "limit": 10}
+            ),
+            "/topics:batch": lambda cur: cur.execute(
+                TOPIC_BATCH_QUERY, {"topic_ids": topic_ids}
+            ),
+            "/graph": lambda cur: query_graph(cur),
+            "/graph (types)": lambda cur: query_graph(cur, types=["task", "method"]),
+            "/graph (indexed)": lambda cur: query_graph(cur, graph_index=graph_index),
+            "/subgraph": lambda cur: query_subgraph(cur, topic_ids[:2]),
+        }
+        if SEARCH_BACKEND == "postgres":
+            cases["/search"] = lambda cur: search_topics_postgres(cur, "neural graph")
+
+        failures = 0
+        for name, run in cases.items():
+            ExplainCursor.plans = []
+            async with conn.cursor() as cur:
+                await run(cur)
+
+            print(name)
+            for label, plan, index_plan in ExplainCursor.plans:
+                print(f"  {label} ({plan['Actual Total Time']:.1f} ms)")
+                for node in scans(plan):
+                    print(f"      {describe(node)}")
+                for node in filter(violation, scans(index_plan)):
+                    failures += 1
+                    print(f"  !!  without sequential scans: {describe(node)}")
+
+    if failures:
+        sys.exit(f"{failures} scans are not served by the expected indexes")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,70 @@
+"""
+Applies the schema migrations in db/migrations on top of db/init.sql:
+
+    poetry run python -m scripts.migrate
+
+Migrations are applied in order of their numeric prefix, each in its own
+transaction, and recorded in schema_migration so every one runs once.
+Their statements are idempotent as well (IF NOT EXISTS), so running them
+against a database that already has some of their objects is safe.
+"""
+
+from pathlib import Path
+
+import psycopg
+
+from server.config import INTERNAL_DB_CONNECTION_STR
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent.parent / "db" / "migrations"
+
+
+def migrate(conn: psycopg.Connection) -> list[str]:
+    """
+    Applies the migrations not yet recorded in schema_migration and returns
+    their names.
+    """
+    with conn.transaction():
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migration (
+                version INT PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            """
+        )
+
+    applied = []
+    for path in sorted(MIGRATIONS_DIR.glob("*.sql")):
+        version = int(path.name.split("_", 1)[0])
+
+        with conn.transaction():
+            # Serializes concurrent runs; the second sees the first's record.
+            conn.execute("LOCK TABLE schema_migration IN EXCLUSIVE MODE")
+            if conn.execute(
+                "SELECT 1 FROM schema_migration WHERE version = %s", (version,)
+            ).fetchone():
+                continue
+
+            conn.execute(path.read_text())
+            conn.execute(
+                "INSERT INTO schema_migration (version, name) VALUES (%s, %s)",
+                (version, path.stem),
+            )
+            applied.append(path.stem)
+
+    return applied
+
+
+def main():
+    with psycopg.connect(INTERNAL_DB_CONNECTION_STR, autocommit=True) as conn:
+        applied = migrate(conn)
+
+    if applied:
+        print(f"Applied {', '.join(applied)}")
+    else:
+        print("Schema is up to date")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import asyncio
+import gzip
+from dataclasses import dataclass, field
+
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from server.metrics import span
+
+# Responses smaller than this are sent uncompressed.
+MIN_COMPRESS_SIZE = 1024
+# Fast settings: live responses are compressed per request, and cached ones
+# on every cache miss.
+BROTLI_QUALITY = 4
+GZIP_LEVEL = 6
+
+# Content codings in order of preference when the client accepts several
+# equally.
+ENCODINGS = ("br", "gzip")
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def choose_encoding(accept_encoding: str, available=ENCODINGS) -> str:
+    """
+    The most preferred of the `available` content codings the client
+    accepts (per its Accept-Encoding q-values), or "identity".
+    """
+    qualities: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, *params = [p.strip() for p in part.split(";")]
+        if not coding:
+            continue
+
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+
+    best, best_quality = "identity", 0.0
+    for encoding in available:
+        quality = qualities.get(encoding, qualities.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+
+    return best
+
+
+@dataclass(frozen=True)
+class EncodedBody:
+    """
+    A response body along with its compressed encodings, built once for
+    bodies served many times (the /graph snapshot, cached /topic responses).
+    """
+
+    identity: bytes
+    encodings: dict[str, bytes] = field(default_factory=dict)
+
+    @property
+    def size(self) -> int:
+        return len(self.identity) + sum(len(b) for b in self.encodings.values())
+
+    def encoding_for(self, request: Request) -> str:
+        return choose_encoding(
+            request.headers.get("accept-encoding", ""), tuple(self.encodings)
+        )
+
+    def response(
+        self,
+        request: Request,
+        headers: dict[str, str] | None = None,
+        encoding: str | None = None,
+    ) -> Response:
+        encoding = encoding or self.encoding_for(request)
+        headers = {**(headers or {}), "Vary": "Accept-Encoding"}
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+
+        return Response(
+            content=self.encodings.get(encoding, self.identity),
+            media_type="application/json",
+            headers=headers,
+        )
+
+
+def encode_body(body: bytes) -> EncodedBody:
+    """
+    Compresses `body` with every supported coding. Slow for large bodies;
+    run it off the event loop.
+    """
+    if len(body) < MIN_COMPRESS_SIZE:
+        return EncodedBody(body)
+    return EncodedBody(body, {e: compress(body, e) for e in ENCODINGS})
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """
+    The strong ETag of one encoding of a representation tagged `etag`.
+    """
+    if encoding == "identity":
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses built per request with the client's preferred
+    coding, in a worker thread so the event loop keeps serving other
+    requests. Responses already negotiated (bodies compressed ahead of
+    time, see `EncodedBody`) are passed through.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = MIN_COMPRESS_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        start_message: Message | None = None
+        body_parts: list[bytes] = []
+
+        async def send_compressed(message: Message):
+            nonlocal start_message
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            body_parts.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            body = b"".join(body_parts)
+            headers = MutableHeaders(raw=list(start_message["headers"]))
+
+            negotiated = "content-encoding" in headers or (
+                "accept-encoding" in headers.get("vary", "").lower()
+            )
+            if not negotiated and len(body) >= self.minimum_size:
+                headers.add_vary_header("Accept-Encoding")
+                if encoding != "identity":
+                    with span("compress", encoding):
+                        body = await asyncio.to_thread(compress, body, encoding)
+                    headers["Content-Encoding"] = encoding
+                    headers["Content-Length"] = str(len(body))
+
+            await send({**start_message, "headers": headers.raw})
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
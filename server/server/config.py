@@ -0,0 +1,55 @@
+import os
+
+INTERNAL_DB_CONNECTION_STR = os.environ.get(
+    "INTERNAL_DB_CONNECTION_STR",
+    "dbname='mydb' user='myuser' host='localhost' password='mysecretpassword' port='5432'",
+)
+
+# Connection pool sizing. One uvicorn worker multiplexes many requests over
+# these connections, so max size bounds concurrent queries per worker.
+DB_POOL_MIN_SIZE = int(os.environ.get("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX_SIZE", "20"))
+# Seconds a request waits for a free connection before failing.
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "10"))
+# Seconds an idle connection is kept open before being closed.
+DB_POOL_MAX_IDLE = float(os.environ.get("DB_POOL_MAX_IDLE", "300"))
+# Server-side statement timeout applied to every pooled connection.
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", "5000"))
+# Queries taking longer than this are logged along with their plan.
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "500"))
+
+# Seconds between checks of the data version for stale in-memory state (the
+# /graph snapshot, the /suggest name index and cached /topic responses), and
+# so about how long that state may lag behind a load.
+DATA_VERSION_POLL_INTERVAL = float(os.environ.get("DATA_VERSION_POLL_INTERVAL", "30"))
+
+# Directory of graph index files written by scripts/build_graph_index.py, one
+# subdirectory per data version. The index is built from the database at
+# startup when this is unset or has no files for the current version.
+GRAPH_INDEX_DIR = os.environ.get("GRAPH_INDEX_DIR", "")
+
+# Backend serving /search: "vespa", or "postgres" to search the database's
+# full-text index (db/migrations/0003_topic_search.sql) without Vespa. Vespa
+# searches that fail fall back to the database's index as well.
+SEARCH_BACKENDS = ("vespa", "postgres")
+SEARCH_BACKEND = os.environ.get("SEARCH_BACKEND", "vespa")
+if SEARCH_BACKEND not in SEARCH_BACKENDS:
+    raise ValueError(
+        f"SEARCH_BACKEND must be one of {', '.join(SEARCH_BACKENDS)}, "
+        f"not {SEARCH_BACKEND!r}"
+    )
+
+VESPA_URL = os.environ.get("VESPA_URL", "http://localhost:8080")
+# Seconds before a Vespa query is abandoned.
+VESPA_TIMEOUT = float(os.environ.get("VESPA_TIMEOUT", "5"))
+# Keep-alive connections held open to Vespa per worker.
+VESPA_MAX_CONNECTIONS = int(os.environ.get("VESPA_MAX_CONNECTIONS", "32"))
+# Queries allowed in flight to Vespa at once per worker; the rest wait.
+VESPA_MAX_CONCURRENCY = int(os.environ.get("VESPA_MAX_CONCURRENCY", "64"))
+
+# In-memory cache of serialized /topic responses, per worker.
+TOPIC_CACHE_MAX_ENTRIES = int(os.environ.get("TOPIC_CACHE_MAX_ENTRIES", "2048"))
+TOPIC_CACHE_MAX_BYTES = int(
+    os.environ.get("TOPIC_CACHE_MAX_BYTES", str(256 * 1024 * 1024))
+)
+TOPIC_CACHE_TTL = float(os.environ.get("TOPIC_CACHE_TTL", "3600"))
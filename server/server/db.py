@@ -0,0 +1,52 @@
+import orjson
+from psycopg import AsyncCursor
+from psycopg.rows import dict_row
+from psycopg.types.json import set_json_loads
+from psycopg_pool import AsyncConnectionPool
+
+from server.config import (
+    DB_POOL_MAX_IDLE,
+    DB_POOL_MAX_SIZE,
+    DB_POOL_MIN_SIZE,
+    DB_POOL_TIMEOUT,
+    DB_STATEMENT_TIMEOUT_MS,
+    INTERNAL_DB_CONNECTION_STR,
+)
+from server.metrics import InstrumentedCursor
+
+# Neighborhood queries return large JSON documents; parse them with orjson.
+set_json_loads(orjson.loads)
+
+
+def create_pool() -> AsyncConnectionPool:
+    """
+    Creates the (unopened) application connection pool. Connections are
+    health-checked when handed out and carry a statement timeout so a single
+    slow query cannot hold a connection indefinitely. Queries are timed
+    through `InstrumentedCursor`.
+    """
+    return AsyncConnectionPool(
+        INTERNAL_DB_CONNECTION_STR,
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        timeout=DB_POOL_TIMEOUT,
+        max_idle=DB_POOL_MAX_IDLE,
+        check=AsyncConnectionPool.check_connection,
+        kwargs={
+            "row_factory": dict_row,
+            "cursor_factory": InstrumentedCursor,
+            "autocommit": True,
+            "options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}",
+        },
+        open=False,
+    )
+
+
+async def get_data_version(cur: AsyncCursor) -> int:
+    """
+    Returns the data version stamp, bumped by `deduplicate_and_load.py
+    load_postgres` every time new data is loaded.
+    """
+    await cur.execute("SELECT version FROM data_version;")
+    row = await cur.fetchone()
+    return row["version"] if row else 0
@@ -0,0 +1,222 @@
+import asyncio
+import base64
+import hashlib
+from collections import Counter
+from dataclasses import dataclass
+
+import orjson
+from psycopg import AsyncCursor
+from psycopg_pool import AsyncConnectionPool
+
+from server.compression import EncodedBody, encode_body
+from server.db import get_data_version
+from server.graph_index import GraphIndex
+from server.metrics import span
+
+DEFAULT_MAX_DEGREE = 499
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 1000
+
+
+def encode_cursor(degree: int, resolved_topic_id: str) -> str:
+    return base64.urlsafe_b64encode(f"{degree}:{resolved_topic_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[int, str]:
+    try:
+        degree, resolved_topic_id = (
+            base64.urlsafe_b64decode(cursor.encode()).decode().split(":", 1)
+        )
+        return int(degree), resolved_topic_id
+    except ValueError:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+async def query_graph(
+    cur: AsyncCursor,
+    min_degree: int | None = None,
+    max_degree: int | None = DEFAULT_MAX_DEGREE,
+    types: list[str] | None = None,
+    limit: int = DEFAULT_LIMIT,
+    cursor: str | None = None,
+    graph_index: GraphIndex | None = None,
+) -> dict:
+    """
+    Returns the graph of the highest-degree topics within the given degree
+    bounds (inclusive) and types, along with the findings shared between
+    them. Topics are paged by (degree, resolved_topic_id) descending; pass
+    the returned `next_cursor` back to fetch the next page. Topics are
+    picked from `graph_index` when given, else from topic_degree_count.
+    """
+    decoded_cursor = decode_cursor(cursor) if cursor is not None else None
+
+    if graph_index is not None:
+        with span("index"):
+            response = graph_index.top_topics(
+                min_degree, max_degree, types, limit + 1, decoded_cursor
+            )
+    else:
+        response = await query_top_topics(
+            cur, min_degree, max_degree, types, limit + 1, decoded_cursor
+        )
+
+    next_cursor = None
+    if len(response) > limit:
+        response = response[:limit]
+        next_cursor = encode_cursor(
+            response[-1]["degree"], response[-1]["resolved_topic_id"]
+        )
+
+    topic_ids = [r["resolved_topic_id"] for r in response]
+
+    return {
+        **await fetch_topic_graph(cur, topic_ids, graph_index),
+        "next_cursor": next_cursor,
+    }
+
+
+async def query_top_topics(
+    cur: AsyncCursor,
+    min_degree: int | None,
+    max_degree: int | None,
+    types: list[str] | None,
+    limit: int,
+    cursor: tuple[int, str] | None,
+) -> list[dict]:
+    conditions = ["TRUE"]
+    params: dict = {"limit": limit}
+
+    if min_degree is not None:
+        conditions.append("degree >= %(min_degree)s")
+        params["min_degree"] = min_degree
+    if max_degree is not None:
+        conditions.append("degree <= %(max_degree)s")
+        params["max_degree"] = max_degree
+    if types:
+        conditions.append("type = ANY(%(types)s)")
+        params["types"] = types
+    if cursor is not None:
+        conditions.append(
+            "(degree, resolved_topic_id) < (%(cursor_degree)s, %(cursor_id)s)"
+        )
+        params["cursor_degree"], params["cursor_id"] = cursor
+
+    await cur.execute(
+        f"""
+        SELECT resolved_topic_id, degree
+        FROM topic_degree_count
+        WHERE {" AND ".join(conditions)}
+        ORDER BY degree DESC, resolved_topic_id DESC
+        LIMIT %(limit)s;
+        """,
+        params,
+    )
+
+    return await cur.fetchall()
+
+
+async def fetch_topic_graph(
+    cur: AsyncCursor, topic_ids: list[str], graph_index: GraphIndex | None = None
+) -> dict:
+    """
+    Returns the given topics along with the findings linking at least two
+    of them, and those links. Links and topic degrees come from
+    `graph_index` when given.
+    """
+    # get links
+    if graph_index is not None:
+        with span("index"):
+            links = graph_index.links(topic_ids)
+    else:
+        await cur.execute(
+            """
+            SELECT t.id AS topic_id, f.id AS finding_id, rt.id AS resolved_topic_id
+            FROM resolved_topic rt
+            JOIN topic_finding tf ON tf.resolved_topic_key = rt.key
+            JOIN topic t ON t.key = tf.topic_key
+            JOIN finding f ON f.key = tf.finding_key
+            WHERE rt.id = ANY(%(topic_ids)s)
+            """,
+            {"topic_ids": topic_ids},
+        )
+        links = await cur.fetchall()
+
+    with span("filter"):
+        finding_degrees = Counter()
+        for link in links:
+            finding_degrees[link["finding_id"]] += 1
+
+        # filter out single-degree findings
+        links = [link for link in links if finding_degrees[link["finding_id"]] > 1]
+
+        # filter out unlinked
+        linked_topics = list(dict.fromkeys(link["resolved_topic_id"] for link in links))
+        linked_findings = list(dict.fromkeys(link["finding_id"] for link in links))
+
+    # get just topics, with their degrees from the index when given
+    if graph_index is not None:
+        with span("index"):
+            degrees = graph_index.topic_degrees(linked_topics)
+
+        await cur.execute(
+            """
+            SELECT t.id, t.name, t.type
+            FROM resolved_topic t
+            WHERE t.id = ANY(%(topic_ids)s)
+            """,
+            {"topic_ids": list(degrees)},
+        )
+        topics = [
+            {**topic, "degree": degrees[topic["id"]]} for topic in await cur.fetchall()
+        ]
+    else:
+        await cur.execute(
+            """
+            SELECT t.id, t.name, t.type, tdc.degree
+            FROM resolved_topic t
+            JOIN topic_degree_count tdc ON t.id = tdc.resolved_topic_id
+            WHERE t.id = ANY(%(topic_ids)s)
+            """,
+            {"topic_ids": linked_topics},
+        )
+        topics = await cur.fetchall()
+
+    # get just findings
+    await cur.execute(
+        """
+        SELECT f.id as finding_id, f.paper_id, f.name
+        FROM finding f
+        WHERE f.id = ANY(%(finding_ids)s)
+        """,
+        {"finding_ids": linked_findings},
+    )
+    findings = await cur.fetchall()
+
+    return {
+        "topics": topics,
+        "findings": findings,
+        "links": links,
+    }
+
+
+@dataclass(frozen=True)
+class GraphSnapshot:
+    version: int
+    etag: str  # of the uncompressed body
+    body: EncodedBody
+
+
+async def build_graph_snapshot(
+    pool: AsyncConnectionPool, graph_index: GraphIndex | None = None
+) -> GraphSnapshot:
+    async with pool.connection() as conn, conn.cursor() as cur:
+        version = await get_data_version(cur)
+        graph = await query_graph(cur, graph_index=graph_index)
+
+    with span("serialize"):
+        body = orjson.dumps(graph)
+    etag = f'"{version}-{hashlib.sha1(body).hexdigest()[:16]}"'
+
+    return GraphSnapshot(
+        version=version, etag=etag, body=await asyncio.to_thread(encode_body, body)
+    )
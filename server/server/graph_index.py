@@ -0,0 +1,387 @@
+import asyncio
+import logging
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+from psycopg.rows import tuple_row
+from psycopg_pool import AsyncConnectionPool
+
+from server.config import GRAPH_INDEX_DIR
+
+logger = logging.getLogger(__name__)
+
+ARRAY_NAMES = (
+    "topic_ids",
+    "topic_types",
+    "finding_ids",
+    "raw_topic_ids",
+    "edge_topics",
+    "edge_findings",
+    "edge_raw_topics",
+    "topic_offsets",
+    "finding_edges",
+    "finding_offsets",
+    "topic_order",
+)
+
+
+def key_columns(rows: list[tuple], width: int) -> list[np.ndarray]:
+    """
+    Columns of (key, *strings) rows, as an int64 array and bytes arrays.
+    """
+    return [np.array([row[0] for row in rows], dtype=np.int64)] + [
+        np.array([row[i].encode() for row in rows], dtype=bytes)
+        for i in range(1, width)
+    ]
+
+
+def intern(
+    edge_keys: np.ndarray, keys: np.ndarray, ids: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Interns the surrogate keys of one edge column as positions in the sorted
+    array of their string ids. Returns that array, each edge's position in
+    it and the row of `keys` each position came from.
+    """
+    key_order = np.argsort(keys)
+    used_keys, edge_positions = np.unique(edge_keys, return_inverse=True)
+    rows = key_order[np.searchsorted(keys, used_keys, sorter=key_order)]
+
+    id_order = np.argsort(ids[rows], kind="stable")
+    positions = np.empty_like(id_order)
+    positions[id_order] = np.arange(len(id_order))
+
+    return ids[rows][id_order], positions[edge_positions], rows[id_order]
+
+
+def offsets_of(keys: np.ndarray, size: int) -> np.ndarray:
+    """
+    CSR offsets for `keys` sorted ascending: entries of key `k` are at
+    `offsets[k]:offsets[k + 1]`.
+    """
+    counts = np.bincount(keys, minlength=size)
+    return np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+
+
+def gather_ranges(offsets: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    """
+    Concatenation of `range(offsets[k], offsets[k + 1])` for every key.
+    """
+    ends = offsets[keys + 1]
+    lengths = ends - offsets[keys]
+    return np.repeat(ends - np.cumsum(lengths), lengths) + np.arange(lengths.sum())
+
+
+class GraphIndex:
+    """
+    Array-backed bipartite adjacency of resolved topics and findings, built
+    from the rows of topic_finding. Ids are interned as positions in sorted
+    arrays; edges are sorted by resolved topic with CSR offsets into them,
+    and `finding_edges` orders them by finding with its own offsets.
+
+    Every array can be saved to and memory-mapped from `.npy` files, so
+    processes forked from (or mapping) the same index share its pages.
+    """
+
+    topic_ids: np.ndarray  # sorted resolved topic ids, as bytes
+    topic_types: np.ndarray  # type of each resolved topic
+    finding_ids: np.ndarray  # sorted finding ids
+    raw_topic_ids: np.ndarray  # sorted (unresolved) topic ids
+    edge_topics: np.ndarray  # resolved topic of each edge
+    edge_findings: np.ndarray  # finding of each edge
+    edge_raw_topics: np.ndarray  # topic of each edge
+    topic_offsets: np.ndarray  # edges of topic t: topic_offsets[t]:[t + 1]
+    finding_edges: np.ndarray  # edges ordered by finding
+    finding_offsets: np.ndarray  # finding_edges of finding f
+    topic_order: np.ndarray  # topics by degree then id, descending
+
+    def __init__(self, arrays: dict[str, np.ndarray]):
+        for name in ARRAY_NAMES:
+            setattr(self, name, arrays[name])
+
+        # same as topic_degree_count: the number of topic_finding rows
+        self.degrees = np.diff(self.topic_offsets)
+
+    @classmethod
+    def from_keys(
+        cls,
+        edges: list[tuple[int, int, int]],
+        topics: list[tuple[int, str, str]],
+        findings: list[tuple[int, str]],
+        raw_topics: list[tuple[int, str]],
+    ) -> "GraphIndex":
+        """
+        Builds the index from topic_finding's (resolved_topic_key,
+        finding_key, topic_key) rows and the (key, id) rows of resolved
+        topics (with their type), findings and topics.
+        """
+        edge_keys = np.array(edges, dtype=np.int64).reshape(-1, 3)
+        topic_keys, topic_ids, types = key_columns(topics, 3)
+
+        topic_ids, edge_topics, topic_rows = intern(
+            edge_keys[:, 0], topic_keys, topic_ids
+        )
+        finding_ids, edge_findings, _ = intern(
+            edge_keys[:, 1], *key_columns(findings, 2)
+        )
+        raw_topic_ids, edge_raw_topics, _ = intern(
+            edge_keys[:, 2], *key_columns(raw_topics, 2)
+        )
+        topic_types = types[topic_rows]
+
+        order = np.lexsort((edge_findings, edge_topics))
+        edge_topics = edge_topics[order].astype(np.int32)
+        edge_findings = edge_findings[order].astype(np.int32)
+        edge_raw_topics = edge_raw_topics[order].astype(np.int32)
+
+        topic_offsets = offsets_of(edge_topics, len(topic_ids))
+        finding_edges = np.argsort(edge_findings, kind="stable").astype(np.int32)
+        finding_offsets = offsets_of(edge_findings[finding_edges], len(finding_ids))
+
+        # ids are sorted, so position breaks degree ties in id order
+        degrees = np.diff(topic_offsets)
+        topic_order = np.lexsort((np.arange(len(topic_ids)), degrees))[::-1]
+
+        return cls(
+            {
+                "topic_ids": topic_ids,
+                "topic_types": topic_types,
+                "finding_ids": finding_ids,
+                "raw_topic_ids": raw_topic_ids,
+                "edge_topics": edge_topics,
+                "edge_findings": edge_findings,
+                "edge_raw_topics": edge_raw_topics,
+                "topic_offsets": topic_offsets,
+                "finding_edges": finding_edges,
+                "finding_offsets": finding_offsets,
+                "topic_order": topic_order.astype(np.int32),
+            }
+        )
+
+    def save(self, path: Path):
+        """
+        Writes the arrays as `.npy` files in the directory `path`, replacing
+        it atomically if it exists.
+        """
+        tmp_path = path.with_name(path.name + ".tmp")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        tmp_path.mkdir(parents=True)
+
+        for name in ARRAY_NAMES:
+            np.save(tmp_path / f"{name}.npy", getattr(self, name))
+
+        old_path = path.with_name(path.name + ".old")
+        if path.exists():
+            os.rename(path, old_path)
+        os.rename(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path: Path) -> "GraphIndex":
+        return cls(
+            {name: np.load(path / f"{name}.npy", mmap_mode="r") for name in ARRAY_NAMES}
+        )
+
+    def topic_index(self, topic_id: str) -> int | None:
+        key = topic_id.encode()
+        i = int(np.searchsorted(self.topic_ids, key))
+        if i < len(self.topic_ids) and self.topic_ids[i] == key:
+            return i
+        return None
+
+    def topic_indices(self, topic_ids: list[str]) -> np.ndarray:
+        indices = [self.topic_index(topic_id) for topic_id in topic_ids]
+        return np.array([i for i in indices if i is not None], dtype=np.int64)
+
+    def topic_degrees(self, topic_ids: list[str]) -> dict[str, int]:
+        """
+        Degrees of the given resolved topics, leaving out those not indexed.
+        """
+        degrees = {}
+        for topic_id in topic_ids:
+            i = self.topic_index(topic_id)
+            if i is not None:
+                degrees[topic_id] = int(self.degrees[i])
+        return degrees
+
+    def edges_to_dicts(self, edges: np.ndarray) -> list[dict]:
+        return [
+            {
+                "topic_id": self.raw_topic_ids[raw_topic].decode(),
+                "finding_id": self.finding_ids[finding].decode(),
+                "resolved_topic_id": self.topic_ids[topic].decode(),
+            }
+            for raw_topic, finding, topic in zip(
+                self.edge_raw_topics[edges].tolist(),
+                self.edge_findings[edges].tolist(),
+                self.edge_topics[edges].tolist(),
+            )
+        ]
+
+    def top_topics(
+        self,
+        min_degree: int | None = None,
+        max_degree: int | None = None,
+        types: list[str] | None = None,
+        limit: int | None = None,
+        cursor: tuple[int, str] | None = None,
+    ) -> list[dict]:
+        """
+        Topics within the degree bounds (inclusive) and types, ordered by
+        degree then id, descending, starting after the (degree, id) cursor.
+        """
+        order = self.topic_order
+        degrees = self.degrees[order]
+        mask = np.ones(len(order), dtype=bool)
+
+        if min_degree is not None:
+            mask &= degrees >= min_degree
+        if max_degree is not None:
+            mask &= degrees <= max_degree
+        if types:
+            mask &= np.isin(self.topic_types[order], [t.encode() for t in types])
+        if cursor is not None:
+            cursor_degree, cursor_id = cursor
+            cursor_position = np.searchsorted(self.topic_ids, cursor_id.encode())
+            mask &= (degrees < cursor_degree) | (
+                (degrees == cursor_degree) & (order < cursor_position)
+            )
+
+        selected = order[np.flatnonzero(mask)[:limit]]
+
+        return [
+            {"resolved_topic_id": self.topic_ids[i].decode(), "degree": degree}
+            for i, degree in zip(selected.tolist(), self.degrees[selected].tolist())
+        ]
+
+    def links(self, topic_ids: list[str]) -> list[dict]:
+        """
+        The topic_finding rows of the given resolved topics.
+        """
+        topics = self.topic_indices(topic_ids)
+        return self.edges_to_dicts(gather_ranges(self.topic_offsets, topics))
+
+    def topic_findings(self, topic: int) -> np.ndarray:
+        start, end = self.topic_offsets[topic], self.topic_offsets[topic + 1]
+        return np.unique(self.edge_findings[start:end])
+
+    def neighborhood(self, topic_id: str) -> tuple[list[str], list[dict], list[str]]:
+        """
+        The findings of a resolved topic, every edge touching those findings
+        and the resolved topics on the other end of those edges.
+        """
+        topic = self.topic_index(topic_id)
+        if topic is None:
+            return [], [], []
+
+        findings = self.topic_findings(topic)
+        edges = self.finding_edges[gather_ranges(self.finding_offsets, findings)]
+        topics = np.unique(self.edge_topics[edges])
+
+        return (
+            [finding_id.decode() for finding_id in self.finding_ids[findings]],
+            self.edges_to_dicts(edges),
+            [topic_id.decode() for topic_id in self.topic_ids[topics]],
+        )
+
+    def expand(
+        self,
+        frontier: list[str],
+        visited: list[str],
+        fanout: int,
+        max_degree: int | None = None,
+    ) -> list[dict]:
+        """
+        In-memory equivalent of `subgraph.expand_hop`: up to `fanout`
+        unvisited neighbors of each frontier topic, ranked by shared
+        findings, then degree, ordered by rank then source topic.
+        """
+        num_topics = len(self.topic_ids)
+        visited_mask = np.zeros(num_topics, dtype=bool)
+        visited_mask[self.topic_indices(visited)] = True
+
+        ranked: list[tuple[str, list[str]]] = []
+        for source_id in sorted(frontier):
+            source = self.topic_index(source_id)
+            if source is None:
+                continue
+
+            findings = self.topic_findings(source)
+            edges = self.finding_edges[gather_ranges(self.finding_offsets, findings)]
+
+            # count each (finding, topic) pair once
+            pairs = np.unique(
+                self.edge_findings[edges].astype(np.int64) * num_topics
+                + self.edge_topics[edges]
+            )
+            neighbors, shared = np.unique(pairs % num_topics, return_counts=True)
+
+            keep = ~visited_mask[neighbors]
+            if max_degree is not None:
+                keep &= self.degrees[neighbors] <= max_degree
+            neighbors, shared = neighbors[keep], shared[keep]
+
+            top = np.lexsort((neighbors, -self.degrees[neighbors], -shared))[:fanout]
+            ranked.append(
+                (source_id, [self.topic_ids[n].decode() for n in neighbors[top]])
+            )
+
+        return [
+            {"source_id": source_id, "topic_id": neighbors[rank]}
+            for rank in range(fanout)
+            for source_id, neighbors in ranked
+            if rank < len(neighbors)
+        ]
+
+
+async def build_graph_index(pool: AsyncConnectionPool) -> GraphIndex:
+    """
+    Exports topic_finding by surrogate keys, fetching the string ids of
+    resolved topics, findings and topics once each rather than per edge.
+    """
+    async with pool.connection() as conn, conn.cursor(row_factory=tuple_row) as cur:
+        await cur.execute(
+            "SELECT resolved_topic_key, finding_key, topic_key FROM topic_finding;"
+        )
+        edges = await cur.fetchall()
+
+        await cur.execute("SELECT key, id, coalesce(type, '') FROM resolved_topic;")
+        topics = await cur.fetchall()
+
+        await cur.execute("SELECT key, id FROM finding;")
+        findings = await cur.fetchall()
+
+        await cur.execute("SELECT key, id FROM topic;")
+        raw_topics = await cur.fetchall()
+
+    # Sorting and interning every edge takes a while, so keep it off the
+    # event loop.
+    return await asyncio.to_thread(
+        GraphIndex.from_keys, edges, topics, findings, raw_topics
+    )
+
+
+def graph_index_path(version: int) -> Path | None:
+    return Path(GRAPH_INDEX_DIR) / str(version) if GRAPH_INDEX_DIR else None
+
+
+async def load_graph_index(pool: AsyncConnectionPool, version: int) -> GraphIndex:
+    """
+    Memory-maps the index saved for this data version under GRAPH_INDEX_DIR
+    (see scripts/build_graph_index.py), or builds it from the database.
+    """
+    path = graph_index_path(version)
+
+    if path is not None:
+        if path.exists():
+            return GraphIndex.load(path)
+
+        logger.warning(
+            "No graph index for data version %s in %s, building it from the database",
+            version,
+            GRAPH_INDEX_DIR,
+        )
+
+    return await build_graph_index(pool)
@@ -0,0 +1,106 @@
+"""
+Production serving profile: gunicorn managing uvicorn workers.
+
+    gunicorn -c python:server.gunicorn_conf server.main:app
+
+The master builds the derived state (graph snapshot, topic name index) once
+before forking, so workers share it copy-on-write instead of each building
+their own. A watcher process polls the data version and, when new data is
+loaded, signals the master to rebuild the state and replace the workers
+gracefully through gunicorn's SIGHUP reload: new workers are forked with the
+new state while the old ones finish their in-flight requests. When a build
+fails, workers build and refresh their own state instead, and the next poll
+reloads to retry it.
+
+The watcher is spawned as a separate process, rather than run as a thread
+of the master, so the master stays single-threaded whenever it forks.
+Rebuilding runs in the master's arbiter loop and blocks it for as long as
+the build takes (about as long as a worker's own startup): the old workers
+keep serving, but the master doesn't restart crashed workers or kill
+timed-out ones until it's done.
+
+Metrics are per worker: each one starts with empty histograms, rather than
+inheriting the samples the master recorded while building the state, and
+/metrics reports only the requests of the worker serving it.
+"""
+
+import multiprocessing
+import os
+import subprocess
+import sys
+
+from server.metrics import reset_metrics
+from server.state import preload_state
+from server.watcher import BUILDING, FAILED
+
+bind = os.environ.get("BIND", "0.0.0.0:80")
+# Each worker is a single-threaded event loop, so one per core.
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+# Seconds old workers get to finish in-flight requests on reload or shutdown.
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+
+# The data version watcher and the data version of the preloaded state, which
+# the master keeps it informed of.
+watcher: subprocess.Popen | None = None
+state_version = FAILED
+
+
+def set_state_version(server, version: int):
+    global state_version
+
+    state_version = version
+    if watcher is not None:
+        try:
+            watcher.stdin.write(f"{version}\n".encode())
+            watcher.stdin.flush()
+        except OSError:
+            server.log.warning("Data version watcher exited")
+
+
+def build_state(server):
+    set_state_version(server, BUILDING)
+    try:
+        state = preload_state()
+        server.log.info("Preloaded state for data version %s", state.version)
+        set_state_version(server, state.version)
+    except Exception:
+        # Workers fall back to building (and refreshing) their own state.
+        server.log.exception("Failed to preload state")
+        set_state_version(server, FAILED)
+
+
+def on_starting(server):
+    build_state(server)
+
+
+def when_ready(server):
+    global watcher
+
+    watcher = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "server.watcher",
+            str(server.pid),
+            str(state_version),
+        ],
+        stdin=subprocess.PIPE,
+    )
+
+
+def on_reload(server):
+    build_state(server)
+
+
+def post_fork(server, worker):
+    reset_metrics()
+
+
+def on_exit(server):
+    if watcher is not None:
+        watcher.terminate()
+        watcher.wait()
@@ -1,14 +1,117 @@
-from collections import Counter
-from fastapi import FastAPI
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+import httpx
+import orjson
+from fastapi import FastAPI, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-import psycopg
-from psycopg.rows import dict_row
-from vespa.application import Vespa
-import ssl
-import os
-import json
+from fastapi.responses import ORJSONResponse, PlainTextResponse
+from psycopg import AsyncCursor
+from pydantic import BaseModel, Field
+
+from server.cache import LRUCache
+from server.compression import (
+    CompressionMiddleware,
+    EncodedBody,
+    encode_body,
+    encoded_etag,
+)
+from server.config import (
+    DATA_VERSION_POLL_INTERVAL,
+    SEARCH_BACKEND,
+    TOPIC_CACHE_MAX_BYTES,
+    TOPIC_CACHE_MAX_ENTRIES,
+    TOPIC_CACHE_TTL,
+)
+from server.db import create_pool
+from server.graph import (
+    DEFAULT_LIMIT,
+    DEFAULT_MAX_DEGREE,
+    MAX_LIMIT,
+    build_graph_snapshot,
+    query_graph,
+)
+from server.graph_index import GraphIndex
+from server.metrics import (
+    TimingMiddleware,
+    record_span,
+    render_gauge,
+    render_metrics,
+    span,
+)
+from server.search import (
+    DEFAULT_SEARCH_LIMIT,
+    MAX_SEARCH_LIMIT,
+    MAX_SEARCH_OFFSET,
+    VespaClient,
+    search_topics,
+    search_topics_postgres,
+)
+from server.state import apply_state, get_preloaded_state, load_state, refresh_state
+from server.subgraph import (
+    DEFAULT_FANOUT,
+    DEFAULT_HOPS,
+    DEFAULT_MAX_TOPICS,
+    MAX_FANOUT,
+    MAX_HOPS,
+    MAX_SUBGRAPH_SEEDS,
+    MAX_TOPICS,
+    query_subgraph,
+)
+from server.suggest import DEFAULT_SUGGEST_LIMIT, MAX_SUGGEST_LIMIT
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    pool = create_pool()
+    await pool.open()
+    app.state.pool = pool
+    app.state.vespa = VespaClient() if SEARCH_BACKEND == "vespa" else None
+    app.state.topic_cache = LRUCache(
+        max_entries=TOPIC_CACHE_MAX_ENTRIES,
+        max_bytes=TOPIC_CACHE_MAX_BYTES,
+        ttl=TOPIC_CACHE_TTL,
+    )
+
+    app.state.derived_state = None
+    app.state.data_version = None
+    app.state.graph_index = None
+    app.state.graph_snapshot = None
+    app.state.topic_name_index = None
+
+    preloaded_state = get_preloaded_state()
+    refresh_task = None
+
+    if preloaded_state is not None:
+        # Built by the gunicorn master before forking, which also replaces
+        # the workers when new data is loaded (see gunicorn_conf.py).
+        apply_state(app, preloaded_state)
+    else:
+        try:
+            await load_state(app)
+        except Exception:
+            logger.exception("Failed to load state")
+
+    if preloaded_state is None or not preloaded_state.complete:
+        # Refreshed by this worker, retrying any parts that failed to build.
+        refresh_task = asyncio.create_task(
+            refresh_state(app, DATA_VERSION_POLL_INTERVAL)
+        )
 
-app = FastAPI()
+    try:
+        yield
+    finally:
+        if refresh_task is not None:
+            refresh_task.cancel()
+        if app.state.vespa is not None:
+            await app.state.vespa.close()
+        await pool.close()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # if os.environ["FASTAPI_ENV"] == "production":
 #     ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
@@ -22,228 +125,527 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+# Brotli for clients that accept it, gzip otherwise. Cached responses and the
+# /graph snapshot are compressed once, when built, and passed through.
+app.add_middleware(CompressionMiddleware)
+
+# Outermost, so request durations include compression
+app.add_middleware(TimingMiddleware)
+
 
 @app.get("/")
 async def root():
     return {"message": "Hello World"}
 
 
+# The topic, its findings (with papers), every edge touching those findings and
+# every resolved topic on the other end of those edges, assembled as a single
+# JSON document so the neighborhood is fetched in one round trip. UNION and
+# DISTINCT do the deduplication that used to happen in Python. topic_finding is
+# read by surrogate keys, which are joined back to string ids.
+TOPIC_NEIGHBORHOOD_QUERY = """
+WITH requested_topic AS (
+    SELECT rt.key FROM resolved_topic rt WHERE rt.id = %(topic_id)s
+),
+topic_finding_keys AS (
+    SELECT DISTINCT tf.finding_key
+    FROM topic_finding tf
+    WHERE tf.resolved_topic_key = (SELECT key FROM requested_topic)
+),
+topic_findings AS (
+    SELECT
+        f.id,
+        f.name,
+        f.slug,
+        f.description,
+        f.created_at,
+        p.id AS paper_id,
+        p.title,
+        p.authors,
+        p.update_date,
+        p.abstract
+    FROM finding f
+    JOIN paper p ON f.paper_id = p.id
+    WHERE f.key IN (SELECT finding_key FROM topic_finding_keys)
+),
+-- every edge of the topic touches one of its findings
+neighborhood_edge_keys AS (
+    SELECT tf.topic_key, tf.finding_key, tf.resolved_topic_key
+    FROM topic_finding tf
+    WHERE tf.finding_key IN (SELECT finding_key FROM topic_finding_keys)
+),
+neighborhood_edges AS (
+    SELECT t.id AS topic_id, f.id AS finding_id, rt.id AS resolved_topic_id
+    FROM neighborhood_edge_keys e
+    JOIN topic t ON t.key = e.topic_key
+    JOIN finding f ON f.key = e.finding_key
+    JOIN resolved_topic rt ON rt.key = e.resolved_topic_key
+),
+neighborhood_topics AS (
+    SELECT rt.id, rt.name, rt.slug, rt.description, rt.type, rt.created_at
+    FROM resolved_topic rt
+    WHERE rt.key IN (
+        SELECT resolved_topic_key FROM neighborhood_edge_keys
+        UNION ALL
+        SELECT key FROM requested_topic
+    )
+)
+SELECT json_build_object(
+    'topic', (
+        SELECT row_to_json(t)
+        FROM (
+            SELECT rt.id, rt.name, rt.slug, rt.description, rt.type, rt.created_at
+            FROM resolved_topic rt
+            WHERE rt.id = %(topic_id)s
+        ) t
+    ),
+    'findings', (SELECT coalesce(json_agg(f), '[]') FROM topic_findings f),
+    'edges', (SELECT coalesce(json_agg(e), '[]') FROM neighborhood_edges e),
+    'topics', (SELECT coalesce(json_agg(t), '[]') FROM neighborhood_topics t)
+) AS neighborhood;
+"""
+
+# The same neighborhood when its findings, edges and topics are already known
+# from the graph index; only their rows are looked up.
+INDEXED_TOPIC_NEIGHBORHOOD_QUERY = """
+SELECT json_build_object(
+    'topic', (
+        SELECT row_to_json(t)
+        FROM (
+            SELECT rt.id, rt.name, rt.slug, rt.description, rt.type, rt.created_at
+            FROM resolved_topic rt
+            WHERE rt.id = %(topic_id)s
+        ) t
+    ),
+    'findings', (
+        SELECT coalesce(json_agg(f), '[]')
+        FROM (
+            SELECT
+                f.id,
+                f.name,
+                f.slug,
+                f.description,
+                f.created_at,
+                p.id AS paper_id,
+                p.title,
+                p.authors,
+                p.update_date,
+                p.abstract
+            FROM finding f
+            JOIN paper p ON f.paper_id = p.id
+            WHERE f.id = ANY(%(finding_ids)s)
+        ) f
+    ),
+    'topics', (
+        SELECT coalesce(json_agg(t), '[]')
+        FROM (
+            SELECT rt.id, rt.name, rt.slug, rt.description, rt.type, rt.created_at
+            FROM resolved_topic rt
+            WHERE rt.id = ANY(%(topic_ids)s)
+        ) t
+    )
+) AS neighborhood;
+"""
+
+
+async def fetch_topic_neighborhood(
+    cur: AsyncCursor, topic_id: str, graph_index: GraphIndex | None
+) -> dict:
+    if graph_index is None:
+        await cur.execute(TOPIC_NEIGHBORHOOD_QUERY, {"topic_id": topic_id})
+        return (await cur.fetchone())["neighborhood"]
+
+    with span("index"):
+        finding_ids, edges, topic_ids = graph_index.neighborhood(topic_id)
+
+    await cur.execute(
+        INDEXED_TOPIC_NEIGHBORHOOD_QUERY,
+        {
+            "topic_id": topic_id,
+            "finding_ids": finding_ids,
+            # the topic itself, even when it has no findings
+            "topic_ids": [topic_id, *topic_ids],
+        },
+    )
+    return {**(await cur.fetchone())["neighborhood"], "edges": edges}
+
+
+# Parts of the /topic response left out unless requested with `fields=`.
+OPTIONAL_TOPIC_FIELDS = {
+    # Duplicate of the top-level findings, kept for older clients.
+    "data.findings",
+}
+
+
+# Responses are cached per worker by data version. Workers learn of a new
+# version from the data version poll (every DATA_VERSION_POLL_INTERVAL seconds,
+# see refresh_state and gunicorn_conf.py), so for up to that long after a load,
+# plus the time to rebuild the derived state, cached responses of the previous
+# data may still be served.
 @app.get("/topic")
-async def read_topic(topic_id: str):
+async def read_topic(request: Request, topic_id: str, fields: str = ""):
+    field_list = sorted(set(fields.split(","))) if fields else []
+
+    invalid_fields = set(field_list) - OPTIONAL_TOPIC_FIELDS
+    if invalid_fields:
+        return {"error": f"Invalid fields: {sorted(invalid_fields)}"}
+
+    topic_cache: LRUCache = request.app.state.topic_cache
+    cache_key = (request.app.state.data_version, topic_id, tuple(field_list))
+
+    encoded: EncodedBody | None = topic_cache.get(cache_key)
+    record_span("cache", None, "miss" if encoded is None else "hit")
+    if encoded is not None:
+        return encoded.response(request)
+
     try:
-        with psycopg.connect(INTERNAL_DB_CONNECTION_STR, row_factory=dict_row) as conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    f"""
-                    SELECT * FROM resolved_topic WHERE id = '{topic_id}';
-                    """
-                )
+        async with request.app.state.pool.connection() as conn, conn.cursor() as cur:
+            neighborhood = await fetch_topic_neighborhood(
+                cur, topic_id, request.app.state.graph_index
+            )
 
-                response = cur.fetchall()
+        if neighborhood["topic"] is None:
+            return {"error": f"Topic {topic_id} not found"}
+
+        data = {
+            "topics": neighborhood["topics"],
+            "edges": neighborhood["edges"],
+        }
+        if "data.findings" in field_list:
+            data["findings"] = neighborhood["findings"]
+
+        with span("serialize"):
+            body = orjson.dumps(
+                {
+                    **neighborhood["topic"],
+                    "findings": neighborhood["findings"],
+                    "data": data,
+                }
+            )
 
-                all_topics = set()
-                all_edges = set()
-                all_findings = set()
+        # Compressed once for every client encoding, so cache hits are sent
+        # as they are.
+        with span("compress"):
+            encoded = await asyncio.to_thread(encode_body, body)
+        topic_cache.set(cache_key, encoded, encoded.size)
 
-                topic = response[0]
+        return encoded.response(request)
+
+    except Exception as e:
+        logger.exception("Failed to read topic %s", topic_id)
+        return {"error": str(e)}
 
-                all_topics.add(tuple(sorted(topic.items())))
 
-                # Edges between topics and findings
-                cur.execute(
-                    f"""
-                    SELECT tf.topic_id, tf.finding_id, tf.resolved_topic_id
-                    FROM topic_finding tf
-                    WHERE tf.resolved_topic_id = '{topic_id}';
-                    """
-                )
+DEFAULT_RELATED_LIMIT = 10
+# Related topics are precomputed for this many per topic, see related_topic.
+MAX_RELATED_LIMIT = 50
 
-                edges = cur.fetchall()
+RELATED_TOPICS_QUERY = """
+SELECT rt.id, rt.name, rt.type, r.shared_findings, r.score
+FROM related_topic r
+JOIN resolved_topic rt ON rt.id = r.related_topic_id
+WHERE r.resolved_topic_id = %(topic_id)s AND r.rank <= %(limit)s
+ORDER BY r.rank;
+"""
 
-                all_edges.update([tuple(sorted(edge.items())) for edge in edges])
 
-                cur.execute(
-                    f"""
-                    SELECT f.*, p.id as paper_id, p.title, p.authors, p.update_date, p.abstract
-                    FROM finding f
-                    JOIN topic_finding tf ON f.id = tf.finding_id
-                    JOIN paper p ON f.paper_id = p.id
-                    WHERE tf.resolved_topic_id = '{topic_id}';
-                    """
-                )
+@app.get("/topic/{topic_id}/related")
+async def read_related_topics(
+    request: Request,
+    topic_id: str,
+    limit: int = Query(DEFAULT_RELATED_LIMIT, ge=1, le=MAX_RELATED_LIMIT),
+):
+    try:
+        async with request.app.state.pool.connection() as conn, conn.cursor() as cur:
+            await cur.execute(
+                RELATED_TOPICS_QUERY, {"topic_id": topic_id, "limit": limit}
+            )
 
-                findings = cur.fetchall()
+            return await cur.fetchall()
 
-                all_findings.update(
-                    [tuple(sorted(finding.items())) for finding in findings]
-                )
+    except Exception as e:
+        logger.exception("Failed to read topics related to %s", topic_id)
+        return {"error": str(e)}
 
-                # Edges between findings and topics
-                cur.execute(
-                    f"""
-                    SELECT tf.topic_id, tf.finding_id, tf.resolved_topic_id
-                    FROM topic_finding tf
-                    WHERE tf.finding_id IN ({", ".join("'" + str(f["id"] + "'") for f in findings)}); 
-                    """
-                )
 
-                edges = cur.fetchall()
+# Neighborhoods of several topics in one round trip. Findings, papers, edges and
+# neighboring topics are deduplicated across the whole batch; each requested
+# topic lists the ids of its own findings. topic_finding is read by surrogate
+# keys, which are joined back to string ids.
+TOPIC_BATCH_QUERY = """
+WITH batch_topic_findings AS (
+    SELECT DISTINCT tf.resolved_topic_key, tf.finding_key
+    FROM topic_finding tf
+    WHERE tf.resolved_topic_key IN (
+        SELECT rt.key FROM resolved_topic rt WHERE rt.id = ANY(%(topic_ids)s)
+    )
+),
+batch_findings AS (
+    SELECT f.id, f.name, f.slug, f.description, f.created_at, f.paper_id
+    FROM finding f
+    WHERE f.key IN (SELECT finding_key FROM batch_topic_findings)
+),
+batch_papers AS (
+    SELECT p.id, p.title, p.authors, p.update_date, p.abstract
+    FROM paper p
+    WHERE p.id IN (SELECT paper_id FROM batch_findings)
+),
+neighborhood_edge_keys AS (
+    SELECT tf.topic_key, tf.finding_key, tf.resolved_topic_key
+    FROM topic_finding tf
+    WHERE tf.finding_key IN (SELECT finding_key FROM batch_topic_findings)
+),
+neighborhood_edges AS (
+    SELECT t.id AS topic_id, f.id AS finding_id, rt.id AS resolved_topic_id
+    FROM neighborhood_edge_keys e
+    JOIN topic t ON t.key = e.topic_key
+    JOIN finding f ON f.key = e.finding_key
+    JOIN resolved_topic rt ON rt.key = e.resolved_topic_key
+),
+batch_topics AS (
+    SELECT rt.id, rt.name, rt.slug, rt.description, rt.type, rt.created_at, (
+        SELECT coalesce(json_agg(f.id), '[]')
+        FROM batch_topic_findings btf
+        JOIN finding f ON f.key = btf.finding_key
+        WHERE btf.resolved_topic_key = rt.key
+    ) AS finding_ids
+    FROM resolved_topic rt
+    WHERE rt.id = ANY(%(topic_ids)s)
+),
+neighborhood_topics AS (
+    SELECT rt.id, rt.name, rt.slug, rt.description, rt.type, rt.created_at
+    FROM resolved_topic rt
+    WHERE rt.key IN (SELECT resolved_topic_key FROM neighborhood_edge_keys)
+)
+SELECT json_build_object(
+    'topics', (SELECT coalesce(json_agg(t), '[]') FROM batch_topics t),
+    'findings', (SELECT coalesce(json_agg(f), '[]') FROM batch_findings f),
+    'papers', (SELECT coalesce(json_agg(p), '[]') FROM batch_papers p),
+    'edges', (SELECT coalesce(json_agg(e), '[]') FROM neighborhood_edges e),
+    'neighbors', (SELECT coalesce(json_agg(t), '[]') FROM neighborhood_topics t)
+) AS batch;
+"""
 
-                all_edges.update([tuple(sorted(edge.items())) for edge in edges])
+MAX_TOPIC_BATCH_SIZE = 100
 
-                # Find all topics related to the findings
-                cur.execute(
-                    f"""
-                    SELECT rt.*
-                    FROM resolved_topic rt
-                    JOIN topic_finding tf ON rt.id = tf.resolved_topic_id
-                    WHERE tf.finding_id IN ({", ".join("'" + str(f["id"] + "'") for f in findings)});
-                    """
-                )
 
-                topics = cur.fetchall()
+class TopicBatchRequest(BaseModel):
+    topic_ids: list[str] = Field(min_length=1, max_length=MAX_TOPIC_BATCH_SIZE)
 
-                all_topics.update([tuple(sorted(topic.items())) for topic in topics])
 
-                data = {
-                    "topics": [dict(topic) for topic in all_topics],
-                    "edges": [dict(edge) for edge in all_edges],
-                    "findings": [dict(finding) for finding in all_findings],
-                }
+@app.post("/topics:batch")
+async def read_topic_batch(request: Request, batch: TopicBatchRequest):
+    # Keep the requested order, without repeats
+    topic_ids = list(dict.fromkeys(batch.topic_ids))
 
-                return {
-                    **topic,
-                    "findings": findings,
-                    "data": data,
+    try:
+        async with request.app.state.pool.connection() as conn, conn.cursor() as cur:
+            await cur.execute(TOPIC_BATCH_QUERY, {"topic_ids": topic_ids})
+
+            result = (await cur.fetchone())["batch"]
+
+        topics_by_id = {topic["id"]: topic for topic in result["topics"]}
+
+        with span("serialize"):
+            body = orjson.dumps(
+                {
+                    **result,
+                    "topics": [
+                        topics_by_id[topic_id]
+                        for topic_id in topic_ids
+                        if topic_id in topics_by_id
+                    ],
+                    "missing": [
+                        topic_id
+                        for topic_id in topic_ids
+                        if topic_id not in topics_by_id
+                    ],
                 }
+            )
+
+        return Response(content=body, media_type="application/json")
 
     except Exception as e:
-        print(e)
+        logger.exception("Failed to read topic batch")
         return {"error": str(e)}
 
 
-INTERNAL_DB_CONNECTION_STR = "dbname='mydb' user='myuser' host='localhost' password='mysecretpassword' port='5432'"
+@app.get("/cache/stats")
+async def get_cache_stats(request: Request):
+    return {"topic": request.app.state.topic_cache.stats()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics(request: Request):
+    cache_stats = request.app.state.topic_cache.stats()
+
+    lines = [
+        *render_gauge(
+            "topic_cache_entries",
+            "Responses held in the /topic cache.",
+            cache_stats["entries"],
+        ),
+        *render_gauge(
+            "topic_cache_bytes",
+            "Size of the responses held in the /topic cache.",
+            cache_stats["bytes"],
+        ),
+        *render_gauge(
+            "topic_cache_hit_rate",
+            "Fraction of /topic cache lookups that were hits.",
+            cache_stats["hit_rate"],
+        ),
+        *render_gauge(
+            "data_version",
+            "Data version the in-memory state was built from.",
+            request.app.state.data_version or 0,
+        ),
+    ]
+
+    return render_metrics() + "\n".join(lines) + "\n"
 
 
 @app.get("/search")
-async def search_topic(query: str, type_list_str: str):
+async def search_topic(
+    request: Request,
+    query: str,
+    type_list_str: str = "",
+    limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_SEARCH_LIMIT),
+    offset: int = Query(0, ge=0, le=MAX_SEARCH_OFFSET),
+):
     type_list = type_list_str.split(",") if type_list_str else []
 
-    vespa_url = "http://localhost:8080"
-
-    # Create a Vespa client
-    app = Vespa(url=vespa_url)
-
     try:
-        type_condition = ""
-        if type_list:  # Check if type_list is not empty
-            type_str = ", ".join(f"'{t}'" for t in type_list)
-            type_condition = (
-                f" and type in ({type_str})"  # Correctly format the IN clause
+        if SEARCH_BACKEND == "vespa":
+            try:
+                return await search_topics(
+                    request.app.state.vespa,
+                    query,
+                    types=type_list,
+                    limit=limit,
+                    offset=offset,
+                )
+            except httpx.HTTPError as e:
+                logger.warning("Vespa search failed, searching Postgres: %s", e)
+
+        async with (
+            request.app.state.pool.connection() as conn,
+            conn.cursor() as cur,
+        ):
+            return await search_topics_postgres(
+                cur, query, types=type_list, limit=limit, offset=offset
             )
-        res = app.query(
-            body={
-                "yql": f"select * from codex where default contains '{query}'{type_condition};"
-            }
-        )
-
-        return [hit["fields"] for hit in res.hits]
 
     except Exception as e:
-        print(e)
+        logger.exception("Failed to search topics")
         return {"error": str(e)}
 
 
-"""
-CREATE MATERIALIZED VIEW topic_degree_count AS
-SELECT
-    resolved_topic_id,
-    COUNT(*) AS degree
-FROM
-    topic_finding
-GROUP BY
-    resolved_topic_id;
-    
-CREATE INDEX topic_degree_count_degree_idx ON topic_degree_count(degree int8_ops);
-"""
+@app.get("/suggest")
+async def suggest_topic(
+    request: Request,
+    query: str,
+    limit: int = Query(DEFAULT_SUGGEST_LIMIT, ge=1, le=MAX_SUGGEST_LIMIT),
+):
+    topic_name_index = request.app.state.topic_name_index
+
+    if topic_name_index is None:
+        return {"error": "Topic name index is not loaded"}
+
+    return topic_name_index.suggest(query, limit)
 
 
 @app.get("/graph")
-async def get_graph():
-    try:
-        with psycopg.connect(INTERNAL_DB_CONNECTION_STR, row_factory=dict_row) as conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    SELECT resolved_topic_id FROM topic_degree_count WHERE degree<500 ORDER BY degree DESC LIMIT 50;
-                    """
+async def get_graph(
+    request: Request,
+    min_degree: int | None = Query(None, ge=0),
+    max_degree: int | None = Query(DEFAULT_MAX_DEGREE, ge=0),
+    type_list_str: str = "",
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    cursor: str | None = None,
+):
+    type_list = type_list_str.split(",") if type_list_str else []
+
+    # Anything other than the default landing page graph is queried live.
+    if (
+        min_degree is not None
+        or max_degree != DEFAULT_MAX_DEGREE
+        or type_list
+        or limit != DEFAULT_LIMIT
+        or cursor is not None
+    ):
+        try:
+            async with (
+                request.app.state.pool.connection() as conn,
+                conn.cursor() as cur,
+            ):
+                return await query_graph(
+                    cur,
+                    min_degree=min_degree,
+                    max_degree=max_degree,
+                    types=type_list,
+                    limit=limit,
+                    cursor=cursor,
+                    graph_index=request.app.state.graph_index,
                 )
 
-                response = cur.fetchall()
+        except Exception as e:
+            logger.exception("Failed to query graph")
+            return {"error": str(e)}
 
-                topic_ids = [r["resolved_topic_id"] for r in response]
+    snapshot = request.app.state.graph_snapshot
 
-                # get just topics
-                cur.execute(
-                    """
-                    SELECT t.id, t.name, t.id, tdc.degree
-                    FROM resolved_topic t
-                    JOIN topic_degree_count tdc ON t.id = tdc.resolved_topic_id
-                    WHERE t.id = ANY(%(topic_ids)s)
-                    """,
-                    {"topic_ids": topic_ids},
-                )
-                topics = cur.fetchall()
-
-                # get just findings
-                cur.execute(
-                    """
-                    SELECT f.id as finding_id, f.paper_id, f.name
-                    FROM finding f
-                    JOIN topic_finding tf ON f.id = tf.finding_id
-                    WHERE tf.resolved_topic_id = ANY(%(topic_ids)s)
-                    """,
-                    {"topic_ids": topic_ids},
-                )
-                findings = cur.fetchall()
-
-                # get links
-                cur.execute(
-                    """
-                    SELECT tf.topic_id, tf.finding_id, tf.resolved_topic_id
-                    FROM topic_finding tf
-                    WHERE tf.resolved_topic_id = ANY(%(topic_ids)s)
-                    """,
-                    {"topic_ids": topic_ids},
-                )
-                links = cur.fetchall()
-
-                finding_degrees = Counter()
-                for link in links:
-                    finding_degrees[link["finding_id"]] += 1
-
-                # filter out single-degree findings
-                links = [
-                    link for link in links if finding_degrees[link["finding_id"]] > 1
-                ]
-
-                linked_topics = set(link["resolved_topic_id"] for link in links)
-                linked_findings = set(link["finding_id"] for link in links)
-
-                # filter out unlinked
-                topics = [topic for topic in topics if topic["id"] in linked_topics]
-                findings = [
-                    finding
-                    for finding in findings
-                    if finding["finding_id"] in linked_findings
-                ]
-
-                return {
-                    "topics": topics,
-                    "findings": findings,
-                    "links": links,
-                }
+    if snapshot is None:
+        try:
+            snapshot = await build_graph_snapshot(
+                request.app.state.pool, request.app.state.graph_index
+            )
+            request.app.state.graph_snapshot = snapshot
+        except Exception as e:
+            logger.exception("Failed to build graph snapshot")
+            return {"error": str(e)}
+
+    # Each encoding is a different representation, with its own ETag.
+    encoding = snapshot.body.encoding_for(request)
+    etag = encoded_etag(snapshot.etag, encoding)
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (
+        if_none_match.strip() == "*"
+        or etag in [tag.strip() for tag in if_none_match.split(",")]
+    ):
+        return Response(status_code=304, headers=headers)
+
+    return snapshot.body.response(request, headers, encoding)
+
+
+@app.get("/subgraph")
+async def get_subgraph(
+    request: Request,
+    topic_ids: str,
+    hops: int = Query(DEFAULT_HOPS, ge=0, le=MAX_HOPS),
+    fanout: int = Query(DEFAULT_FANOUT, ge=1, le=MAX_FANOUT),
+    max_degree: int | None = Query(None, ge=0),
+    max_topics: int = Query(DEFAULT_MAX_TOPICS, ge=1, le=MAX_TOPICS),
+):
+    seeds = list(dict.fromkeys(topic_ids.split(",")))
+
+    if len(seeds) > MAX_SUBGRAPH_SEEDS:
+        return {"error": f"At most {MAX_SUBGRAPH_SEEDS} seed topics are allowed"}
+
+    try:
+        async with request.app.state.pool.connection() as conn, conn.cursor() as cur:
+            return await query_subgraph(
+                cur,
+                seeds,
+                hops=hops,
+                fanout=fanout,
+                max_degree=max_degree,
+                max_topics=max_topics,
+                graph_index=request.app.state.graph_index,
+            )
 
     except Exception as e:
-        print(e)
+        logger.exception("Failed to query subgraph")
         return {"error": str(e)}
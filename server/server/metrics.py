@@ -0,0 +1,309 @@
+import bisect
+import logging
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import psycopg
+from psycopg import AsyncCursor
+from psycopg.rows import tuple_row
+from psycopg.sql import Composable
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from server.config import SLOW_QUERY_MS
+
+logger = logging.getLogger(__name__)
+
+# Prometheus' default latency buckets, in seconds.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+ROW_BUCKETS = (1, 10, 100, 1000, 10000, 100000)
+
+
+class Histogram:
+    """
+    Cumulative histogram in the Prometheus exposition format, with one
+    series per combination of label values.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...],
+        buckets: tuple[float, ...] = DURATION_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+
+        # label values -> (per-bucket counts with a trailing +Inf, sum)
+        self.series: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, *labelvalues: str):
+        counts, total = self.series.setdefault(
+            labelvalues, ([0] * (len(self.buckets) + 1), [0.0])
+        )
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def reset(self):
+        self.series.clear()
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+
+        for labelvalues, (counts, total) in sorted(self.series.items()):
+            labels = [
+                f'{name}="{escape_label(value)}"'
+                for name, value in zip(self.labelnames, labelvalues)
+            ]
+
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                bucket_labels = ",".join([*labels, f'le="{bound}"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+
+            series_labels = ",".join(labels)
+            lines.append(f"{self.name}_sum{{{series_labels}}} {total[0]}")
+            lines.append(f"{self.name}_count{{{series_labels}}} {cumulative}")
+
+        return lines
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_gauge(name: str, help: str, value: float) -> list[str]:
+    return [f"# HELP {name} {help}", f"# TYPE {name} gauge", f"{name} {value}"]
+
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time from receiving a request to starting the response.",
+    ("method", "route", "status"),
+)
+SPAN_DURATION = Histogram(
+    "span_duration_seconds",
+    "Time spent in instrumented parts of request handling.",
+    ("span",),
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Time to execute a database query and receive its results.",
+    ("query",),
+)
+DB_QUERY_ROWS = Histogram(
+    "db_query_rows",
+    "Rows returned or affected by a database query.",
+    ("query",),
+    buckets=ROW_BUCKETS,
+)
+
+# Histograms are kept per process. Under gunicorn each worker reports only
+# the requests and queries it handled itself, so a scrape of /metrics through
+# the shared port sees whichever worker accepted it; aggregate across workers
+# (e.g. scrape each one, or sum rates over time) rather than reading one
+# scrape as the whole server.
+HISTOGRAMS = [REQUEST_DURATION, SPAN_DURATION, DB_QUERY_DURATION, DB_QUERY_ROWS]
+
+
+def render_metrics() -> str:
+    return "\n".join(line for h in HISTOGRAMS for line in h.render()) + "\n"
+
+
+def reset_metrics():
+    """
+    Clears every histogram. Called in forked workers, which would otherwise
+    report the samples their parent recorded (e.g. queries building the
+    preloaded state) as their own.
+    """
+    for h in HISTOGRAMS:
+        h.reset()
+
+
+class RequestTimings:
+    """
+    Spans recorded while handling one request, reported back to the client
+    in a `Server-Timing` header.
+    """
+
+    def __init__(self):
+        self.spans: list[tuple[str, float | None, str | None]] = []
+
+    def add(self, name: str, duration: float | None, desc: str | None = None):
+        self.spans.append((name, duration, desc))
+
+    def header(self, total: float) -> str:
+        entries = []
+        for name, duration, desc in [*self.spans, ("total", total, None)]:
+            entry = name
+            if duration is not None:
+                entry += f";dur={duration * 1000:.1f}"
+            if desc is not None:
+                entry += f';desc="{desc}"'
+            entries.append(entry)
+
+        return ", ".join(entries)
+
+
+request_timings: ContextVar[RequestTimings | None] = ContextVar(
+    "request_timings", default=None
+)
+
+
+def record_span(name: str, duration: float | None, desc: str | None = None):
+    """
+    Adds a span to the current request's timings, if there is a request.
+    """
+    timings = request_timings.get()
+    if timings is not None:
+        timings.add(name, duration, desc)
+
+
+@contextmanager
+def span(name: str, desc: str | None = None):
+    """
+    Times the enclosed block as a span of the current request.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        SPAN_DURATION.observe(duration, name)
+        record_span(name, duration, desc)
+
+
+QUERY_RELATION_PATTERN = re.compile(
+    r"\b(?:FROM|INTO|UPDATE|WITH)\s+(\w+)", re.IGNORECASE
+)
+
+
+def query_label(query: str) -> str:
+    """
+    Short, low-cardinality name for a query: its statement type and the
+    first relation it reads from or writes to, e.g. `select finding`.
+    """
+    words = query.split(maxsplit=1)
+    verb = words[0].lower() if words else ""
+    match = QUERY_RELATION_PATTERN.search(query)
+    return f"{verb} {match.group(1)}" if match else verb
+
+
+class InstrumentedCursor(AsyncCursor):
+    """
+    Cursor that records the duration and row count of every query as a
+    `db` span and in the query histograms, and logs the plan of any query
+    slower than `SLOW_QUERY_MS`.
+    """
+
+    async def execute(self, query, params=None, **kwargs):
+        # the pool's empty-statement connection checks are not worth recording
+        if not query:
+            return await super().execute(query, params, **kwargs)
+
+        start = time.perf_counter()
+        try:
+            await super().execute(query, params, **kwargs)
+        except Exception:
+            await self.record_query(query, params, start)
+            raise
+
+        await self.record_query(query, params, start)
+        return self
+
+    async def record_query(self, query, params, start: float):
+        duration = time.perf_counter() - start
+        rows = max(self.rowcount, 0)
+
+        query_str = query.as_string(self) if isinstance(query, Composable) else query
+        if isinstance(query_str, bytes):
+            query_str = query_str.decode()
+        label = query_label(query_str)
+
+        DB_QUERY_DURATION.observe(duration, label)
+        DB_QUERY_ROWS.observe(rows, label)
+        record_span("db", duration, f"{label} ({rows} rows)")
+
+        if duration * 1000 >= SLOW_QUERY_MS:
+            await self.log_slow_query(query_str, params, duration)
+
+    async def log_slow_query(self, query: str, params, duration: float):
+        # Planned on a plain cursor, so the EXPLAIN is not itself recorded
+        # and does not replace this cursor's results.
+        try:
+            async with AsyncCursor(self.connection, row_factory=tuple_row) as cur:
+                await cur.execute("EXPLAIN " + query, params)
+                plan = "\n".join(row[0] for row in await cur.fetchall())
+        except psycopg.Error as e:
+            plan = f"(no plan: {e})"
+
+        logger.warning(
+            "Slow query (%.0f ms): %s\n%s", duration * 1000, query.strip(), plan
+        )
+
+
+def route_path(scope: Scope) -> str:
+    """
+    The path template of the route matching the request, so metrics are
+    labelled by endpoint rather than by URL.
+    """
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+class TimingMiddleware:
+    """
+    Collects the spans recorded while handling each HTTP request, returns
+    them in a `Server-Timing` header and records the request duration.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = request_timings.set(timings)
+        start = time.perf_counter()
+        started = False
+
+        def observe(status: int) -> float:
+            total = time.perf_counter() - start
+            REQUEST_DURATION.observe(
+                total, scope["method"], route_path(scope), str(status)
+            )
+            return total
+
+        async def send_with_timings(message: Message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+                total = observe(message["status"])
+
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timings.header(total).encode()))
+                headers.append((b"timing-allow-origin", b"*"))
+                message = {**message, "headers": headers}
+
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timings)
+        except Exception:
+            if not started:
+                observe(500)
+            raise
+        finally:
+            request_timings.reset(token)
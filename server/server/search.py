@@ -0,0 +1,138 @@
+import asyncio
+
+import httpx
+from psycopg import AsyncCursor
+
+from server.config import (
+    VESPA_MAX_CONCURRENCY,
+    VESPA_MAX_CONNECTIONS,
+    VESPA_TIMEOUT,
+    VESPA_URL,
+)
+from server.metrics import span
+
+TOPIC_TYPES = {"task", "benchmark", "architecture", "model", "method", "dataset"}
+
+DEFAULT_SEARCH_LIMIT = 10
+MAX_SEARCH_LIMIT = 100
+# Vespa's default ceiling on query offsets.
+MAX_SEARCH_OFFSET = 1000
+
+
+class VespaClient:
+    """
+    Application-scoped client for the Vespa query API. Holds a single pooled
+    HTTP session so connections are kept alive between requests, and bounds
+    the number of queries in flight.
+    """
+
+    def __init__(
+        self,
+        url: str = VESPA_URL,
+        timeout: float = VESPA_TIMEOUT,
+        max_connections: int = VESPA_MAX_CONNECTIONS,
+        max_concurrency: int = VESPA_MAX_CONCURRENCY,
+    ):
+        self.client = httpx.AsyncClient(
+            base_url=url,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def query(self, body: dict) -> list[dict]:
+        async with self.semaphore:
+            with span("vespa"):
+                res = await self.client.post("/search/", json=body)
+
+        res.raise_for_status()
+
+        return [hit["fields"] for hit in res.json()["root"].get("children", [])]
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def validate_types(types: list[str] | None):
+    invalid_types = set(types or []) - TOPIC_TYPES
+    if invalid_types:
+        raise ValueError(f"Invalid topic types: {sorted(invalid_types)}")
+
+
+async def search_topics(
+    vespa: VespaClient,
+    query: str,
+    types: list[str] | None = None,
+    limit: int = DEFAULT_SEARCH_LIMIT,
+    offset: int = 0,
+) -> list[dict]:
+    """
+    Runs a bm25-ranked full-text search over resolved topics. The query text
+    is bound through `userInput` rather than spliced into the YQL, and the
+    `topic` summary class keeps hits down to the fields the client renders.
+    """
+    validate_types(types)
+
+    type_condition = ""
+    if types:
+        type_str = ", ".join(f'"{t}"' for t in types)
+        type_condition = f" and type in ({type_str})"
+
+    return await vespa.query(
+        {
+            "yql": f"select * from codex where userInput(@query){type_condition}",
+            "query": query,
+            "hits": limit,
+            "offset": offset,
+            "ranking.profile": "bm25",
+            "presentation.summary": "topic",
+        }
+    )
+
+
+async def search_topics_postgres(
+    cur: AsyncCursor,
+    query: str,
+    types: list[str] | None = None,
+    limit: int = DEFAULT_SEARCH_LIMIT,
+    offset: int = 0,
+) -> list[dict]:
+    """
+    The same search over resolved_topic's full-text and trigram indexes:
+    topics whose name or description match the query's words, or whose
+    name is similar to it, ranked by word matches (names first) plus name
+    similarity. Hits have the fields of Vespa's `topic` summary.
+    """
+    validate_types(types)
+
+    conditions = [
+        (
+            "(rt.search_vector @@ websearch_to_tsquery('english', %(query)s)"
+            " OR rt.name %% %(query)s)"
+        )
+    ]
+    params: dict = {"query": query, "limit": limit, "offset": offset}
+
+    if types:
+        conditions.append("rt.type = ANY(%(types)s)")
+        params["types"] = types
+
+    await cur.execute(
+        f"""
+        SELECT rt.id, rt.name, rt.type, rt.description
+        FROM resolved_topic rt
+        WHERE {" AND ".join(conditions)}
+        ORDER BY
+            ts_rank(rt.search_vector, websearch_to_tsquery('english', %(query)s))
+                + similarity(rt.name, %(query)s) DESC,
+            rt.id
+        LIMIT %(limit)s
+        OFFSET %(offset)s;
+        """,
+        params,
+    )
+
+    return await cur.fetchall()
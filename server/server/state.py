@@ -0,0 +1,153 @@
+import asyncio
+import gc
+import logging
+from collections.abc import Awaitable
+from dataclasses import dataclass
+from typing import TypeVar
+
+from fastapi import FastAPI
+from psycopg_pool import AsyncConnectionPool
+
+from server.db import create_pool, get_data_version
+from server.graph import GraphSnapshot, build_graph_snapshot
+from server.graph_index import GraphIndex, load_graph_index
+from server.suggest import TopicNameIndex, build_topic_name_index
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class DerivedState:
+    version: int
+    # Parts that failed to build are None; their endpoints fall back to the
+    # database (or report them as not loaded).
+    graph_index: GraphIndex | None
+    graph_snapshot: GraphSnapshot | None
+    topic_name_index: TopicNameIndex | None
+
+    @property
+    def complete(self) -> bool:
+        return None not in (
+            self.graph_index,
+            self.graph_snapshot,
+            self.topic_name_index,
+        )
+
+
+async def build_part(name: str, build: Awaitable[T]) -> T | None:
+    try:
+        return await build
+    except Exception:
+        logger.exception("Failed to build the %s", name)
+        return None
+
+
+async def build_state(
+    pool: AsyncConnectionPool, previous: DerivedState | None = None
+) -> DerivedState:
+    """
+    Builds the read-only state derived from the database: the topic-finding
+    graph index, the default /graph snapshot and the /suggest topic name
+    index. Each part is built on its own, so one failing leaves the others
+    in place. Parts of a `previous` state of the same data version are
+    reused rather than rebuilt.
+    """
+    async with pool.connection() as conn, conn.cursor() as cur:
+        version = await get_data_version(cur)
+
+    if previous is None or previous.version != version:
+        previous = DerivedState(version, None, None, None)
+
+    graph_index = previous.graph_index or await build_part(
+        "graph index", load_graph_index(pool, version)
+    )
+    graph_snapshot = previous.graph_snapshot or await build_part(
+        "graph snapshot", build_graph_snapshot(pool, graph_index)
+    )
+    topic_name_index = previous.topic_name_index or await build_part(
+        "topic name index", build_topic_name_index(pool)
+    )
+
+    return DerivedState(
+        version=version,
+        graph_index=graph_index,
+        graph_snapshot=graph_snapshot,
+        topic_name_index=topic_name_index,
+    )
+
+
+def apply_state(app: FastAPI, state: DerivedState):
+    # Cached responses are keyed by data version, so entries from the
+    # previous version can never be served again.
+    if app.state.data_version != state.version:
+        app.state.topic_cache.clear()
+
+    app.state.derived_state = state
+    app.state.graph_index = state.graph_index
+    app.state.graph_snapshot = state.graph_snapshot
+    app.state.topic_name_index = state.topic_name_index
+    app.state.data_version = state.version
+
+
+async def load_state(app: FastAPI):
+    """
+    Rebuilds the derived state (or the parts of it that failed to build)
+    and drops cached /topic responses from the previous data version.
+    """
+    apply_state(app, await build_state(app.state.pool, app.state.derived_state))
+
+
+async def refresh_state(app: FastAPI, interval: float):
+    """
+    Polls the data version and reloads the derived state whenever it changes
+    (or some of it failed to build).
+    """
+    pool: AsyncConnectionPool = app.state.pool
+
+    while True:
+        await asyncio.sleep(interval)
+
+        try:
+            async with pool.connection() as conn, conn.cursor() as cur:
+                version = await get_data_version(cur)
+
+            state: DerivedState | None = app.state.derived_state
+            if state is None or state.version != version or not state.complete:
+                await load_state(app)
+
+        except Exception:
+            logger.exception("Failed to refresh state")
+
+
+_preloaded_state: DerivedState | None = None
+
+
+def preload_state() -> DerivedState:
+    """
+    Builds the derived state in the current process, for workers forked
+    from it to start with instead of building their own. Used by the
+    gunicorn master, so every worker shares one copy-on-write copy (the
+    graph index's arrays are never written, so their pages stay shared).
+    """
+    global _preloaded_state
+
+    async def build():
+        async with create_pool() as pool:
+            return await build_state(pool)
+
+    # If the build fails, workers forked afterwards build (and refresh)
+    # their own state rather than serving the previous version's.
+    _preloaded_state = None
+    _preloaded_state = asyncio.run(build())
+
+    # Move everything allocated so far out of the collector's reach, so
+    # collections in the workers don't write to (and so copy) shared pages.
+    gc.freeze()
+
+    return _preloaded_state
+
+
+def get_preloaded_state() -> DerivedState | None:
+    return _preloaded_state
@@ -0,0 +1,122 @@
+from psycopg import AsyncCursor
+
+from server.graph import fetch_topic_graph
+from server.graph_index import GraphIndex
+from server.metrics import span
+
+MAX_SUBGRAPH_SEEDS = 10
+DEFAULT_HOPS = 2
+MAX_HOPS = 3
+DEFAULT_FANOUT = 10
+MAX_FANOUT = 50
+DEFAULT_MAX_TOPICS = 200
+MAX_TOPICS = 1000
+
+
+async def expand_hop(
+    cur: AsyncCursor,
+    frontier: list[str],
+    visited: list[str],
+    fanout: int,
+    max_degree: int | None,
+) -> list[dict]:
+    """
+    Returns up to `fanout` unvisited neighbors of each frontier topic, where
+    neighbors are topics sharing a finding. Each topic's neighbors are
+    ranked by shared findings, then degree. Findings are matched by
+    surrogate key, and neighbors only mapped back to their ids once counted.
+    """
+    await cur.execute(
+        """
+        WITH shared AS (
+            SELECT
+                src.resolved_topic_key AS source_key,
+                dst.resolved_topic_key AS topic_key,
+                count(DISTINCT dst.finding_key) AS shared_findings
+            FROM topic_finding src
+            JOIN topic_finding dst ON src.finding_key = dst.finding_key
+            WHERE src.resolved_topic_key IN (
+                    SELECT key FROM resolved_topic WHERE id = ANY(%(frontier)s)
+                )
+                AND dst.resolved_topic_key NOT IN (
+                    SELECT key FROM resolved_topic WHERE id = ANY(%(visited)s)
+                )
+            GROUP BY src.resolved_topic_key, dst.resolved_topic_key
+        )
+        SELECT source_id, topic_id
+        FROM (
+            SELECT
+                source.id AS source_id,
+                rt.id AS topic_id,
+                row_number() OVER (
+                    PARTITION BY shared.source_key
+                    ORDER BY shared.shared_findings DESC, tdc.degree DESC, rt.id
+                ) AS rank
+            FROM shared
+            JOIN resolved_topic source ON source.key = shared.source_key
+            JOIN resolved_topic rt ON rt.key = shared.topic_key
+            JOIN topic_degree_count tdc ON rt.id = tdc.resolved_topic_id
+            WHERE %(max_degree)s::int IS NULL OR tdc.degree <= %(max_degree)s
+        ) neighbors
+        WHERE rank <= %(fanout)s
+        ORDER BY rank, source_id;
+        """,
+        {
+            "frontier": frontier,
+            "visited": visited,
+            "fanout": fanout,
+            "max_degree": max_degree,
+        },
+    )
+
+    return await cur.fetchall()
+
+
+async def query_subgraph(
+    cur: AsyncCursor,
+    seeds: list[str],
+    hops: int = DEFAULT_HOPS,
+    fanout: int = DEFAULT_FANOUT,
+    max_degree: int | None = None,
+    max_topics: int = DEFAULT_MAX_TOPICS,
+    graph_index: GraphIndex | None = None,
+) -> dict:
+    """
+    Breadth-first expansion from the seed topics over shared findings, in
+    memory when `graph_index` is given and one query per hop otherwise.
+    Each expanded topic contributes at most `fanout` neighbors, topics above
+    `max_degree` are pruned (so hubs don't pull in the whole graph), and
+    expansion stops at `max_topics`. Returns the subgraph in the same shape
+    as /graph, with each topic's hop distance.
+    """
+    hop_by_topic = {seed: 0 for seed in seeds}
+    frontier = list(seeds)
+
+    for hop in range(1, hops + 1):
+        if not frontier or len(hop_by_topic) >= max_topics:
+            break
+
+        if graph_index is not None:
+            with span("index"):
+                neighbors = graph_index.expand(
+                    frontier, list(hop_by_topic), fanout, max_degree
+                )
+        else:
+            neighbors = await expand_hop(
+                cur, frontier, list(hop_by_topic), fanout, max_degree
+            )
+
+        frontier = []
+        for neighbor in neighbors:
+            if len(hop_by_topic) >= max_topics:
+                break
+            if neighbor["topic_id"] not in hop_by_topic:
+                hop_by_topic[neighbor["topic_id"]] = hop
+                frontier.append(neighbor["topic_id"])
+
+    subgraph = await fetch_topic_graph(cur, list(hop_by_topic), graph_index)
+
+    for topic in subgraph["topics"]:
+        topic["hop"] = hop_by_topic[topic["id"]]
+
+    return subgraph
@@ -0,0 +1,109 @@
+import asyncio
+import bisect
+import heapq
+import re
+
+from psycopg_pool import AsyncConnectionPool
+
+DEFAULT_SUGGEST_LIMIT = 10
+MAX_SUGGEST_LIMIT = 25
+
+# Top suggestions are precomputed for every prefix matching more index
+# entries than this, so a lookup never scans more than this many entries.
+MAX_SCANNED_ENTRIES = 256
+# Sorts after every character, for finding the end of a prefix's range.
+MAX_CHAR = "\U0010ffff"
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def name_keys(name: str) -> list[str]:
+    """
+    Returns the suffixes of a normalized name starting at each word, so that
+    "Graph Neural Network" can be found by typing "neu" as well as "gra".
+    """
+    normalized = normalize(name)
+    return [normalized[match.start() :] for match in re.finditer(r"\w+", normalized)]
+
+
+class TopicNameIndex:
+    """
+    Sorted array of resolved topic names (keyed at every word start) for
+    prefix lookups. Matches are ordered by topic degree.
+    """
+
+    def __init__(self, topics: list[dict]):
+        self.topics = topics
+
+        entries = sorted(
+            (key, i)
+            for i, topic in enumerate(topics)
+            for key in name_keys(topic["name"])
+        )
+        self.keys = [key for key, _ in entries]
+        self.topic_indices = [i for _, i in entries]
+
+        self.cached_suggestions: dict[str, list[int]] = {}
+
+        # Walk down from the empty prefix one character at a time, only
+        # descending into prefixes whose ranges are still too wide.
+        wide_prefixes = [("", 0, len(self.keys))]
+        while wide_prefixes:
+            prefix, lo, hi = wide_prefixes.pop()
+            length = len(prefix) + 1
+
+            i = lo
+            while i < hi:
+                if len(self.keys[i]) < length:
+                    i += 1
+                    continue
+
+                child = self.keys[i][:length]
+                child_hi = bisect.bisect_left(self.keys, child + MAX_CHAR, i, hi)
+
+                if child_hi - i > MAX_SCANNED_ENTRIES:
+                    self.cached_suggestions[child] = self._top_topics(
+                        i, child_hi, MAX_SUGGEST_LIMIT
+                    )
+                    wide_prefixes.append((child, i, child_hi))
+
+                i = child_hi
+
+    def _top_topics(self, lo: int, hi: int, limit: int) -> list[int]:
+        return heapq.nlargest(
+            limit,
+            set(self.topic_indices[lo:hi]),
+            key=lambda i: self.topics[i]["degree"],
+        )
+
+    def suggest(self, query: str, limit: int = DEFAULT_SUGGEST_LIMIT) -> list[dict]:
+        prefix = normalize(query)
+        if not prefix:
+            return []
+
+        if prefix in self.cached_suggestions:
+            indices = self.cached_suggestions[prefix][:limit]
+        else:
+            lo = bisect.bisect_left(self.keys, prefix)
+            hi = bisect.bisect_left(self.keys, prefix + MAX_CHAR, lo)
+            indices = self._top_topics(lo, hi, limit)
+
+        return [self.topics[i] for i in indices]
+
+
+async def build_topic_name_index(pool: AsyncConnectionPool) -> TopicNameIndex:
+    async with pool.connection() as conn, conn.cursor() as cur:
+        await cur.execute(
+            """
+            SELECT rt.id, rt.name, rt.type, coalesce(tdc.degree, 0) AS degree
+            FROM resolved_topic rt
+            LEFT JOIN topic_degree_count tdc ON rt.id = tdc.resolved_topic_id
+            WHERE rt.name IS NOT NULL;
+            """
+        )
+        topics = await cur.fetchall()
+
+    # Building sorts every name key, so keep it off the event loop.
+    return await asyncio.to_thread(TopicNameIndex, topics)
@@ -0,0 +1,83 @@
+"""
+Polls the data version for the gunicorn master and signals it to reload
+when new data is loaded (see gunicorn_conf.py). Runs as a child process of
+the master:
+
+    python -m server.watcher MASTER_PID STATE_VERSION
+
+The master writes the data version of its preloaded state to stdin, one per
+line, as it rebuilds it: BUILDING while a build runs, FAILED if it failed.
+"""
+
+import argparse
+import logging
+import os
+import select
+import signal
+import sys
+import time
+
+import psycopg
+
+from server.config import DATA_VERSION_POLL_INTERVAL, INTERNAL_DB_CONNECTION_STR
+
+BUILDING = -1
+FAILED = -2
+
+logger = logging.getLogger(__name__)
+
+
+def watch(master_pid: int, state_version: int, interval: float):
+    """
+    Signals the master whenever the data version differs from its state's
+    and no build is running, once per version unless that reload fails to
+    build the state. Exits along with the master.
+    """
+    signalled = None
+    next_poll = time.monotonic() + interval
+
+    while os.getppid() == master_pid:
+        timeout = max(0.0, next_poll - time.monotonic())
+        if select.select([sys.stdin], [], [], timeout)[0]:
+            lines = os.read(sys.stdin.fileno(), 4096).split()
+            if not lines:
+                return
+            state_version = int(lines[-1])
+            continue
+
+        next_poll = time.monotonic() + interval
+
+        try:
+            with psycopg.connect(INTERNAL_DB_CONNECTION_STR) as conn:
+                (version,) = conn.execute(
+                    "SELECT version FROM data_version;"
+                ).fetchone()
+        except psycopg.Error as e:
+            logger.warning("Failed to check data version: %s", e)
+            continue
+
+        if state_version in (version, BUILDING) or (
+            version == signalled and state_version != FAILED
+        ):
+            continue
+
+        signalled = version
+        logger.info("Data version changed to %s, reloading workers", version)
+        os.kill(master_pid, signal.SIGHUP)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("master_pid", type=int)
+    parser.add_argument("state_version", type=int)
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="[%(asctime)s] [%(process)d] [%(levelname)s] %(message)s",
+    )
+    watch(args.master_pid, args.state_version, DATA_VERSION_POLL_INTERVAL)
+
+
+if __name__ == "__main__":
+    main()
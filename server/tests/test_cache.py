@@ -0,0 +1,102 @@
+import pytest
+
+from server import cache
+from server.cache import LRUCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_get_and_set():
+    c = LRUCache(max_entries=10, max_bytes=1000, ttl=60)
+
+    assert c.get("a") is None
+    c.set("a", b"abc")
+
+    assert c.get("a") == b"abc"
+    assert c.stats()["hits"] == 1
+    assert c.stats()["misses"] == 1
+    assert c.total_bytes == 3
+
+
+def test_entries_expire_after_ttl(clock):
+    c = LRUCache(max_entries=10, max_bytes=1000, ttl=60)
+    c.set("a", b"abc")
+
+    clock[0] += 59
+    assert c.get("a") == b"abc"
+
+    clock[0] += 2
+    assert c.get("a") is None
+    assert "a" not in c.entries
+    assert c.total_bytes == 0
+
+
+def test_evicts_least_recently_used_by_count():
+    c = LRUCache(max_entries=2, max_bytes=1000, ttl=60)
+    c.set("a", b"1")
+    c.set("b", b"2")
+    c.get("a")
+    c.set("c", b"3")
+
+    assert list(c.entries) == ["a", "c"]
+    assert c.evictions == 1
+
+
+def test_evicts_by_size():
+    c = LRUCache(max_entries=10, max_bytes=10, ttl=60)
+    c.set("a", b"x" * 4)
+    c.set("b", b"x" * 4)
+    c.set("c", b"x" * 4)
+
+    assert list(c.entries) == ["b", "c"]
+    assert c.total_bytes == 8
+
+
+def test_skips_values_larger_than_the_cache():
+    c = LRUCache(max_entries=10, max_bytes=10, ttl=60)
+    c.set("a", b"x" * 4)
+    c.set("b", b"x" * 11)
+
+    assert c.get("b") is None
+    assert c.get("a") == b"x" * 4
+
+
+def test_replacing_a_key_updates_its_size():
+    c = LRUCache(max_entries=10, max_bytes=100, ttl=60)
+    c.set("a", b"x" * 10)
+    c.set("a", b"x" * 3)
+
+    assert len(c.entries) == 1
+    assert c.total_bytes == 3
+
+
+def test_explicit_size_for_non_bytes_values():
+    c = LRUCache(max_entries=10, max_bytes=100, ttl=60)
+    value = object()
+    c.set("a", value, size=40)
+
+    assert c.get("a") is value
+    assert c.total_bytes == 40
+
+
+def test_keys_of_other_data_versions_miss():
+    # /topic responses are keyed by (data version, topic id, fields)
+    c = LRUCache(max_entries=10, max_bytes=100, ttl=60)
+    c.set((1, "resolved_topic:a", ()), b"old")
+
+    assert c.get((2, "resolved_topic:a", ())) is None
+    assert c.get((1, "resolved_topic:a", ())) == b"old"
+
+
+def test_clear():
+    c = LRUCache(max_entries=10, max_bytes=100, ttl=60)
+    c.set("a", b"abc")
+    c.clear()
+
+    assert c.get("a") is None
+    assert c.total_bytes == 0
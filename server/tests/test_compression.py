@@ -0,0 +1,116 @@
+import gzip
+
+import brotli
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from starlette.responses import Response
+
+from server.compression import (
+    MIN_COMPRESS_SIZE,
+    CompressionMiddleware,
+    choose_encoding,
+    encode_body,
+    encoded_etag,
+)
+
+LARGE_BODY = b'{"items": [' + b'"item",' * MIN_COMPRESS_SIZE + b'"item"]}'
+SMALL_BODY = b'{"items": []}'
+
+
+def decompress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.decompress(body)
+    return gzip.decompress(body)
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, expected",
+    [
+        ("", "identity"),
+        ("gzip", "gzip"),
+        ("gzip, deflate, br", "br"),
+        ("br;q=0.5, gzip", "gzip"),
+        ("br;q=0, gzip;q=0", "identity"),
+        ("*", "br"),
+        ("*;q=0.1, gzip;q=0.5", "gzip"),
+        ("deflate", "identity"),
+        ("br;q=oops, gzip", "gzip"),
+    ],
+)
+def test_choose_encoding(accept_encoding, expected):
+    assert choose_encoding(accept_encoding) == expected
+
+
+def test_choose_encoding_from_available():
+    assert choose_encoding("br, gzip", ("gzip",)) == "gzip"
+    assert choose_encoding("br", ()) == "identity"
+
+
+def test_encode_body_round_trip():
+    encoded = encode_body(LARGE_BODY)
+
+    assert encoded.identity == LARGE_BODY
+    assert set(encoded.encodings) == {"br", "gzip"}
+    for encoding, body in encoded.encodings.items():
+        assert decompress(body, encoding) == LARGE_BODY
+    assert encoded.size == len(LARGE_BODY) + sum(
+        len(body) for body in encoded.encodings.values()
+    )
+
+
+def test_encode_body_leaves_small_bodies_uncompressed():
+    assert encode_body(SMALL_BODY).encodings == {}
+
+
+def test_encoded_etag():
+    assert encoded_etag('"3-abc"', "identity") == '"3-abc"'
+    assert encoded_etag('"3-abc"', "br") == '"3-abc-br"'
+
+
+@pytest.fixture(scope="module")
+def client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware)
+
+    @app.get("/large")
+    async def large():
+        return Response(LARGE_BODY, media_type="application/json")
+
+    @app.get("/small")
+    async def small():
+        return Response(SMALL_BODY, media_type="application/json")
+
+    encoded = encode_body(LARGE_BODY)
+
+    @app.get("/encoded")
+    async def precompressed(request: Request):
+        return encoded.response(request)
+
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("path", ["/large", "/encoded"])
+@pytest.mark.parametrize("accept_encoding", ["br", "gzip", "identity"])
+def test_responses_are_compressed_as_accepted(client, path, accept_encoding):
+    # read undecoded, to check the bytes sent
+    with client.stream(
+        "GET", path, headers={"Accept-Encoding": accept_encoding}
+    ) as response:
+        raw = b"".join(response.iter_raw())
+
+    encoding = response.headers.get("content-encoding", "identity")
+    assert encoding == accept_encoding
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) == len(raw)
+    if encoding != "identity":
+        raw = decompress(raw, encoding)
+    assert raw == LARGE_BODY
+
+
+def test_small_responses_are_not_compressed(client):
+    response = client.get("/small", headers={"Accept-Encoding": "br"})
+
+    assert "content-encoding" not in response.headers
+    assert "vary" not in response.headers
+    assert response.content == SMALL_BODY
@@ -0,0 +1,15 @@
+import importlib
+
+import pytest
+
+from server import config
+
+
+def test_unknown_search_backend_is_rejected(monkeypatch):
+    monkeypatch.setenv("SEARCH_BACKEND", "elastic")
+    try:
+        with pytest.raises(ValueError, match="SEARCH_BACKEND"):
+            importlib.reload(config)
+    finally:
+        monkeypatch.undo()
+        importlib.reload(config)
@@ -0,0 +1,15 @@
+import pytest
+
+from server.graph import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(42, "resolved_topic:a:b")
+
+    assert decode_cursor(cursor) == (42, "resolved_topic:a:b")
+
+
+@pytest.mark.parametrize("cursor", ["", "not a cursor", "Zm9v", "YWJjOmRlZg=="])
+def test_invalid_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
@@ -0,0 +1,140 @@
+import numpy as np
+import pytest
+
+from server.graph_index import ARRAY_NAMES, GraphIndex
+
+# Keys are deliberately not in id order, and rt:e has no edges.
+TOPICS = [
+    (10, "rt:b", "method"),
+    (20, "rt:a", "task"),
+    (30, "rt:d", "dataset"),
+    (40, "rt:c", "task"),
+    (50, "rt:e", "task"),
+]
+FINDINGS = [(4, "f:1"), (3, "f:2"), (2, "f:3"), (1, "f:4")]
+# (resolved topic, finding, raw topic)
+EDGES = [
+    ("rt:a", "f:1", "t:1"),
+    ("rt:a", "f:2", "t:2"),
+    ("rt:b", "f:1", "t:3"),
+    ("rt:b", "f:2", "t:4"),
+    ("rt:b", "f:3", "t:5"),
+    ("rt:c", "f:3", "t:6"),
+    ("rt:d", "f:4", "t:7"),
+]
+RAW_TOPICS = [(100 - i, raw_topic) for i, (_, _, raw_topic) in enumerate(EDGES)]
+
+
+def edge_dict(edge: tuple[str, str, str]) -> dict:
+    resolved_topic_id, finding_id, topic_id = edge
+    return {
+        "topic_id": topic_id,
+        "finding_id": finding_id,
+        "resolved_topic_id": resolved_topic_id,
+    }
+
+
+def sorted_edges(edges: list[dict]) -> list[tuple]:
+    return sorted(tuple(sorted(edge.items())) for edge in edges)
+
+
+@pytest.fixture(scope="module")
+def index() -> GraphIndex:
+    topic_keys = {id: key for key, id, _ in TOPICS}
+    finding_keys = {id: key for key, id in FINDINGS}
+    raw_topic_keys = {id: key for key, id in RAW_TOPICS}
+    edges = [(topic_keys[t], finding_keys[f], raw_topic_keys[r]) for t, f, r in EDGES]
+    return GraphIndex.from_keys(edges, TOPICS, FINDINGS, RAW_TOPICS)
+
+
+def test_from_keys_interns_ids_in_order(index):
+    assert index.topic_ids.tolist() == [b"rt:a", b"rt:b", b"rt:c", b"rt:d"]
+    assert index.topic_types.tolist() == [b"task", b"method", b"task", b"dataset"]
+    assert index.finding_ids.tolist() == [b"f:1", b"f:2", b"f:3", b"f:4"]
+    assert index.degrees.tolist() == [2, 3, 1, 1]
+
+
+def test_topic_index(index):
+    assert index.topic_index("rt:c") == 2
+    assert index.topic_index("rt:e") is None
+    assert index.topic_index("rt:z") is None
+
+
+def test_topic_degrees(index):
+    assert index.topic_degrees(["rt:b", "rt:e", "rt:d"]) == {"rt:b": 3, "rt:d": 1}
+
+
+def test_links(index):
+    links = index.links(["rt:a", "rt:d", "rt:missing"])
+
+    expected = [edge_dict(e) for e in EDGES if e[0] in ("rt:a", "rt:d")]
+    assert sorted_edges(links) == sorted_edges(expected)
+
+
+def test_neighborhood(index):
+    finding_ids, edges, topic_ids = index.neighborhood("rt:c")
+
+    assert finding_ids == ["f:3"]
+    assert sorted_edges(edges) == sorted_edges(
+        [edge_dict(e) for e in EDGES if e[1] == "f:3"]
+    )
+    assert topic_ids == ["rt:b", "rt:c"]
+
+
+def test_neighborhood_of_unknown_topic(index):
+    assert index.neighborhood("rt:e") == ([], [], [])
+
+
+def test_top_topics(index):
+    def ids(topics):
+        return [topic["resolved_topic_id"] for topic in topics]
+
+    assert ids(index.top_topics()) == ["rt:b", "rt:a", "rt:d", "rt:c"]
+    assert index.top_topics(limit=1) == [{"resolved_topic_id": "rt:b", "degree": 3}]
+    assert ids(index.top_topics(min_degree=2)) == ["rt:b", "rt:a"]
+    assert ids(index.top_topics(max_degree=2)) == ["rt:a", "rt:d", "rt:c"]
+    assert ids(index.top_topics(types=["task"])) == ["rt:a", "rt:c"]
+    assert ids(index.top_topics(cursor=(2, "rt:a"))) == ["rt:d", "rt:c"]
+    assert ids(index.top_topics(cursor=(1, "rt:d"))) == ["rt:c"]
+
+
+def test_expand_ranks_by_shared_findings(index):
+    # rt:a shares two findings with rt:b, rt:c one
+    assert index.expand(["rt:b"], ["rt:b"], fanout=5) == [
+        {"source_id": "rt:b", "topic_id": "rt:a"},
+        {"source_id": "rt:b", "topic_id": "rt:c"},
+    ]
+    assert index.expand(["rt:b"], ["rt:b"], fanout=1) == [
+        {"source_id": "rt:b", "topic_id": "rt:a"}
+    ]
+
+
+def test_expand_skips_visited_and_high_degree_topics(index):
+    assert index.expand(["rt:b"], ["rt:b", "rt:a"], fanout=5) == [
+        {"source_id": "rt:b", "topic_id": "rt:c"}
+    ]
+    assert index.expand(["rt:b"], ["rt:b"], fanout=5, max_degree=1) == [
+        {"source_id": "rt:b", "topic_id": "rt:c"}
+    ]
+
+
+def test_expand_orders_by_rank_then_source(index):
+    assert index.expand(["rt:c", "rt:a"], ["rt:a", "rt:c"], fanout=2) == [
+        {"source_id": "rt:a", "topic_id": "rt:b"},
+        {"source_id": "rt:c", "topic_id": "rt:b"},
+    ]
+
+
+def test_save_and_load(index, tmp_path):
+    path = tmp_path / "index"
+    index.save(path)
+    # saving again replaces the directory
+    index.save(path)
+    loaded = GraphIndex.load(path)
+
+    for name in ARRAY_NAMES:
+        assert isinstance(getattr(loaded, name), np.memmap)
+        np.testing.assert_array_equal(getattr(loaded, name), getattr(index, name))
+
+    assert loaded.neighborhood("rt:a") == index.neighborhood("rt:a")
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["index"]
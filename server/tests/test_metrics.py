@@ -0,0 +1,35 @@
+from server.metrics import Histogram, query_label
+
+
+def test_histogram_render_is_cumulative():
+    h = Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1))
+    h.observe(0.05, "/topic")
+    h.observe(0.5, "/topic")
+    h.observe(5, "/topic")
+
+    assert h.render() == [
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{route="/topic",le="0.1"} 1',
+        'latency_seconds_bucket{route="/topic",le="1"} 2',
+        'latency_seconds_bucket{route="/topic",le="+Inf"} 3',
+        'latency_seconds_sum{route="/topic"} 5.55',
+        'latency_seconds_count{route="/topic"} 3',
+    ]
+
+
+def test_histogram_reset():
+    h = Histogram("latency_seconds", "Latency.", ("route",))
+    h.observe(0.05, "/topic")
+    h.reset()
+
+    assert h.render() == [
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+    ]
+
+
+def test_query_label():
+    assert query_label("SELECT id FROM resolved_topic WHERE id = %s") == (
+        "select resolved_topic"
+    )
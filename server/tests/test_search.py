@@ -0,0 +1,112 @@
+import asyncio
+import json
+from functools import partial
+
+import httpx
+import pytest
+
+from server import search
+from server.search import VespaClient
+
+
+def vespa_client(monkeypatch, handler, **kwargs) -> VespaClient:
+    transport = httpx.MockTransport(handler)
+    monkeypatch.setattr(
+        search.httpx, "AsyncClient", partial(httpx.AsyncClient, transport=transport)
+    )
+    return VespaClient(url="http://vespa", **kwargs)
+
+
+def hits(*fields: dict) -> dict:
+    return {"root": {"children": [{"fields": f} for f in fields]}}
+
+
+def test_query_returns_hit_fields(monkeypatch):
+    requests = []
+
+    def handler(request: httpx.Request):
+        requests.append(request)
+        return httpx.Response(200, json=hits({"id": "a"}, {"id": "b"}))
+
+    async def run():
+        vespa = vespa_client(monkeypatch, handler)
+        try:
+            return await vespa.query({"yql": "select * from codex"})
+        finally:
+            await vespa.close()
+
+    assert asyncio.run(run()) == [{"id": "a"}, {"id": "b"}]
+    assert requests[0].method == "POST"
+    assert requests[0].url == "http://vespa/search/"
+    assert json.loads(requests[0].content) == {"yql": "select * from codex"}
+
+
+def test_query_without_hits(monkeypatch):
+    def handler(request: httpx.Request):
+        return httpx.Response(200, json={"root": {"fields": {"totalCount": 0}}})
+
+    async def run():
+        vespa = vespa_client(monkeypatch, handler)
+        try:
+            return await vespa.query({})
+        finally:
+            await vespa.close()
+
+    assert asyncio.run(run()) == []
+
+
+def test_query_raises_on_error_status(monkeypatch):
+    def handler(request: httpx.Request):
+        return httpx.Response(503)
+
+    async def run():
+        vespa = vespa_client(monkeypatch, handler)
+        try:
+            await vespa.query({})
+        finally:
+            await vespa.close()
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(run())
+
+
+def test_client_is_reused_with_a_timeout(monkeypatch):
+    clients = set()
+
+    def handler(request: httpx.Request):
+        return httpx.Response(200, json=hits())
+
+    async def run():
+        vespa = vespa_client(monkeypatch, handler, timeout=1.5)
+        try:
+            for _ in range(3):
+                await vespa.query({})
+                clients.add(id(vespa.client))
+            return vespa.client.timeout
+        finally:
+            await vespa.close()
+
+    assert asyncio.run(run()) == httpx.Timeout(1.5)
+    assert len(clients) == 1
+
+
+def test_queries_in_flight_are_bounded(monkeypatch):
+    in_flight, peak = 0, 0
+
+    async def handler(request: httpx.Request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return httpx.Response(200, json=hits())
+
+    async def run():
+        vespa = vespa_client(monkeypatch, handler, max_concurrency=2)
+        try:
+            await asyncio.gather(*(vespa.query({}) for _ in range(8)))
+        finally:
+            await vespa.close()
+
+    asyncio.run(run())
+    assert peak == 2
@@ -0,0 +1,65 @@
+from server.suggest import MAX_SCANNED_ENTRIES, TopicNameIndex, name_keys
+
+
+def topic(name: str, degree: int) -> dict:
+    return {"id": f"rt:{name}", "name": name, "type": "task", "degree": degree}
+
+
+def names(topics: list[dict]) -> list[str]:
+    return [topic["name"] for topic in topics]
+
+
+def test_name_keys_start_at_each_word():
+    assert name_keys("Graph  Neural-Network") == [
+        "graph neural-network",
+        "neural-network",
+        "network",
+    ]
+
+
+def test_suggest_matches_any_word_by_degree():
+    index = TopicNameIndex(
+        [
+            topic("Graph Neural Network", 5),
+            topic("Neural Radiance Field", 9),
+            topic("Graph Cut", 1),
+        ]
+    )
+
+    assert names(index.suggest("neu")) == [
+        "Neural Radiance Field",
+        "Graph Neural Network",
+    ]
+    assert names(index.suggest("  GRAPH ")) == ["Graph Neural Network", "Graph Cut"]
+    assert names(index.suggest("graph n")) == ["Graph Neural Network"]
+    assert names(index.suggest("neu", limit=1)) == ["Neural Radiance Field"]
+
+
+def test_suggest_without_matches():
+    index = TopicNameIndex([topic("Graph Cut", 1)])
+
+    assert index.suggest("") == []
+    assert index.suggest("   ") == []
+    assert index.suggest("tree") == []
+
+
+def test_topic_matching_several_words_is_suggested_once():
+    index = TopicNameIndex([topic("Network of Networks", 3)])
+
+    assert names(index.suggest("net")) == ["Network of Networks"]
+
+
+def test_precomputed_suggestions_match_a_scan():
+    topics = [topic(f"Model {i}", i) for i in range(2 * MAX_SCANNED_ENTRIES)]
+    topics += [topic(f"Method {i}", 10_000 + i) for i in range(10)]
+    index = TopicNameIndex(topics)
+
+    assert "m" in index.cached_suggestions
+    assert "mo" in index.cached_suggestions
+
+    for prefix in ("m", "mo", "model 1", "me"):
+        expected = sorted(
+            (t for t in topics if t["name"].lower().startswith(prefix)),
+            key=lambda t: -t["degree"],
+        )[:10]
+        assert index.suggest(prefix, limit=10) == expected
@@ -0,0 +1,74 @@
+import os
+import signal
+
+import pytest
+
+from server import watcher
+from server.watcher import BUILDING, FAILED
+
+MASTER_PID = 4242
+
+
+class FakeConnection:
+    def __init__(self, version: int):
+        self.version = version
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query):
+        return self
+
+    def fetchone(self):
+        return (self.version,)
+
+
+@pytest.fixture
+def master(monkeypatch):
+    """
+    Runs the watcher against a sequence of polled data versions, each of
+    which may come with state versions the master writes before the next
+    poll. Returns the signals sent to the master.
+    """
+    read_fd, write_fd = os.pipe()
+    stdin = os.fdopen(read_fd, "rb")
+    monkeypatch.setattr(watcher.sys, "stdin", stdin)
+
+    signals = []
+    monkeypatch.setattr(watcher.os, "kill", lambda pid, sig: signals.append(sig))
+
+    def run(polls: list[tuple[int, list[int]]], state_version: int) -> list[int]:
+        remaining = list(polls)
+
+        def connect(dsn):
+            version, written = remaining.pop(0)
+            for state in written:
+                os.write(write_fd, f"{state}\n".encode())
+            return FakeConnection(version)
+
+        monkeypatch.setattr(watcher.psycopg, "connect", connect)
+        monkeypatch.setattr(
+            watcher.os, "getppid", lambda: MASTER_PID if remaining else 1
+        )
+        watcher.watch(MASTER_PID, state_version, interval=0)
+        return signals
+
+    yield run
+
+    stdin.close()
+    os.close(write_fd)
+
+
+def test_signals_once_per_version(master):
+    signals = master([(1, []), (2, []), (2, []), (2, [BUILDING]), (2, [2])], 1)
+
+    assert signals == [signal.SIGHUP]
+
+
+def test_retries_a_failed_build(master):
+    signals = master([(2, []), (2, [BUILDING, FAILED]), (2, [BUILDING])], 1)
+
+    assert signals == [signal.SIGHUP, signal.SIGHUP]